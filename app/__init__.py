@@ -1,5 +1,6 @@
 # --- Initialisation de l'application Flask ---
 
+import logging
 import os
 from flask import Flask, request, jsonify
 from flask_socketio import SocketIO
@@ -14,8 +15,32 @@ app = Flask(__name__)
 # aléatoire et sécurisée à chaque démarrage de l'application.
 app.secret_key = os.urandom(24)
 
+# Fenêtre (en secondes) pendant laquelle les changements d'état successifs sont regroupés
+# en une seule diffusion. À 0, un seul delta est émis à la fin de chaque requête.
+app.config['BROADCAST_WINDOW'] = float(os.environ.get('WEBTRACKER_BROADCAST_WINDOW', 0))
+# Nombre de prochains participants dont la vue portrait précharge l'image (0 : pas de préchargement).
+app.config['PORTRAIT_LOOKAHEAD'] = int(os.environ.get('WEBTRACKER_PORTRAIT_LOOKAHEAD', 3))
+
+# Journalisation : les messages de l'application ('app' et ses modules) sont écrits sur la sortie
+# d'erreur sous la forme 'clé=valeur', à partir du niveau 'LOG_LEVEL' (DEBUG, INFO, WARNING...).
+# Si l'application est intégrée à un programme qui configure déjà la journalisation, seul le niveau est appliqué.
+app.config['LOG_LEVEL'] = os.environ.get('WEBTRACKER_LOG_LEVEL', 'INFO').upper()
+logging.basicConfig(format='%(asctime)s level=%(levelname)s logger=%(name)s %(message)s')
+logging.getLogger(__name__).setLevel(app.config['LOG_LEVEL'])
+
+# Profilage par échantillonnage (voir 'app.profiling') : fraction des requêtes et messages Socket.IO
+# suivis (0 : inactif, modifiable ensuite par '/admin/profile') et intervalle entre deux relevés de pile.
+app.config['PROFILE_RATE'] = float(os.environ.get('WEBTRACKER_PROFILE_RATE', 0))
+app.config['PROFILE_INTERVAL'] = float(os.environ.get('WEBTRACKER_PROFILE_INTERVAL', 0.005))
+# '/admin/profile' n'est pas authentifié : ses réglages ne peuvent être changés (POST) que si le profilage
+# est activé au démarrage ('PROFILE_RATE') ou explicitement autorisé ('WEBTRACKER_PROFILE_ADMIN=1').
+app.config['PROFILE_ADMIN'] = os.environ.get('WEBTRACKER_PROFILE_ADMIN', '0') == '1' or app.config['PROFILE_RATE'] > 0
+
 # --- Configuration de CORS (Cross-Origin Resource Sharing) ---
 
+# Routes servant des fichiers statiques, sans en-têtes CORS (voir 'routes.py').
+STATIC_ENDPOINTS = {'static', 'fingerprinted_static', 'portrait_variant', 'status_icon_atlas'}
+
 @app.after_request
 def after_request(response):
     """
@@ -23,16 +48,52 @@ def after_request(response):
     pour autoriser les requêtes provenant d'autres origines (domaines).
     C'est utile pour les API et les applications web qui interagissent avec des clients
     hébergés sur des domaines différents.
+    Les fichiers statiques (icônes, scripts, portraits) n'en ont pas besoin.
     """
+    if request.endpoint in STATIC_ENDPOINTS:
+        return response
     response.headers.add('Access-Control-Allow-Origin', '*')
     response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
     response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
     return response
 
+# Stockage de l'état des combats : 'memory' (un seul processus) ou une URL Redis
+# ('redis://hote:6379/0') pour partager les combats entre plusieurs processus serveur.
+app.config['STATE_BACKEND'] = os.environ.get('WEBTRACKER_STATE_BACKEND', 'memory')
+
+# Format des sauvegardes de joueurs et de rencontres : 'json' (JSON compact) ou 'msgpack'
+# (binaire, nécessite le paquet 'msgpack'). Les fichiers des deux formats restent lisibles.
+app.config['PERSISTENCE_FORMAT'] = os.environ.get('WEBTRACKER_PERSISTENCE_FORMAT', 'json')
+
+# Journal des événements : chaque changement d'état d'une table est ajouté à un journal sur disque,
+# rejoué au redémarrage pour reprendre un combat interrompu. Un dossier vide désactive le journal.
+# 'JOURNAL_FSYNC' : délai (en secondes) entre deux synchronisations sur disque (0 : à chaque événement).
+# 'JOURNAL_SNAPSHOT_EVERY' : nombre d'événements d'une table entre deux instantanés complets.
+app.config['JOURNAL_DIR'] = os.environ.get(
+    'WEBTRACKER_JOURNAL_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'journal'))
+app.config['JOURNAL_FSYNC'] = float(os.environ.get('WEBTRACKER_JOURNAL_FSYNC', 1.0))
+app.config['JOURNAL_SNAPSHOT_EVERY'] = int(os.environ.get('WEBTRACKER_JOURNAL_SNAPSHOT_EVERY', 1000))
+
+# Compression des réponses HTTP (voir 'app.compression') : gzip, ou Brotli si le paquet 'brotli'
+# est installé. Seules les réponses d'au moins 'COMPRESS_MIN_SIZE' octets sont compressées.
+app.config['COMPRESSION'] = os.environ.get('WEBTRACKER_COMPRESSION', '1') != '0'
+app.config['COMPRESS_MIN_SIZE'] = int(os.environ.get('WEBTRACKER_COMPRESS_MIN_SIZE', 1024))
+
+# File de messages utilisée par SocketIO pour relayer les diffusions entre processus.
+# Par défaut, le serveur Redis du stockage d'état est utilisé s'il y en a un.
+message_queue = os.environ.get('WEBTRACKER_MESSAGE_QUEUE')
+if message_queue is None and app.config['STATE_BACKEND'] != 'memory':
+    message_queue = app.config['STATE_BACKEND']
+
 # Initialise l'extension SocketIO pour gérer les WebSockets.
 # 'async_mode="eventlet"' spécifie le serveur asynchrone à utiliser.
 # 'cors_allowed_origins="*" autorise les connexions WebSocket de n'importe quelle origine.
-socketio = SocketIO(app, async_mode='eventlet', cors_allowed_origins="*")
+# 'message_queue' permet à tous les processus de diffuser aux clients connectés aux autres.
+# 'http_compression' et 'compression_threshold' appliquent les réglages de compression aux réponses
+# du transport HTTP (long-polling). Sur WebSocket, le serveur d'eventlet accepte l'extension
+# 'permessage-deflate' proposée par les navigateurs : les messages sont compressés sur chaque connexion.
+socketio = SocketIO(app, async_mode='eventlet', cors_allowed_origins="*", message_queue=message_queue,
+                    http_compression=app.config['COMPRESSION'], compression_threshold=app.config['COMPRESS_MIN_SIZE'])
 
 # --- Importation des modules de l'application ---
 
@@ -0,0 +1,174 @@
+import os
+import io
+import base64
+import struct
+import hashlib
+from urllib.parse import quote
+from flask import url_for
+from werkzeug.utils import safe_join
+from app import app
+from app.portrait_utils import source_digest
+
+try:
+    from PIL import Image
+except ImportError: # Dépendance optionnelle : sans Pillow, les icônes sont intégrées à leur taille d'origine.
+    Image = None
+
+# --- URL des ressources statiques avec empreinte ---
+# Les fichiers statiques (icônes, scripts) et les portraits sont servis sous une URL contenant
+# une empreinte de leur contenu. Une URL donnée désigne donc toujours le même contenu : le
+# navigateur peut la garder en cache sans jamais la revalider ('Cache-Control: immutable').
+# Un fichier modifié change d'empreinte, donc d'URL.
+
+# Durée de cache (en secondes) des ressources servies avec empreinte : un an.
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+# Dossier des portraits, dont les empreintes sont calculées à la demande (voir 'portrait_url()').
+PORTRAIT_DIR = os.path.join(app.static_folder, 'portraits')
+
+def file_fingerprint(path):
+    """Retourne l'empreinte courte (12 caractères hexadécimaux) du contenu d'un fichier."""
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            sha.update(chunk)
+    return sha.hexdigest()[:12]
+
+def build_manifest(static_folder):
+    """
+    Calcule l'empreinte de chaque fichier statique, hors portraits.
+
+    Returns:
+        dict: Chemin relatif au dossier 'static' (séparateur '/') -> empreinte.
+    """
+    manifest = {}
+    for root, dirs, files in os.walk(static_folder):
+        if root == static_folder and 'portraits' in dirs:
+            dirs.remove('portraits') # Nombreux et modifiables à chaud : empreintes calculées à la demande.
+        for name in files:
+            path = os.path.join(root, name)
+            manifest[os.path.relpath(path, static_folder).replace(os.sep, '/')] = file_fingerprint(path)
+    return manifest
+
+# Manifeste calculé une seule fois au démarrage : les fichiers statiques font partie du déploiement.
+manifest = build_manifest(app.static_folder)
+
+def asset_url(filename):
+    """
+    Retourne l'URL avec empreinte d'un fichier statique ('filename' relatif au dossier 'static').
+    Un fichier absent du manifeste garde son URL '/static/...' habituelle.
+    """
+    fingerprint = manifest.get(filename)
+    if fingerprint is None:
+        return url_for('static', filename=filename)
+    return url_for('fingerprinted_static', fingerprint=fingerprint, filename=filename)
+
+def portrait_url(portrait, variant):
+    """
+    Retourne l'URL d'une variante d'un portrait ('thumb' ou 'display'), avec l'empreinte
+    du portrait original dans le chemin, ou None si le participant n'a pas de portrait ou si son
+    chemin sort du dossier des portraits. Un portrait introuvable garde son URL '/static/portraits/...' habituelle.
+
+    L'URL est construite sans 'url_for' : elle est aussi calculée hors d'une requête,
+    pour les deltas d'état émis par une tâche de fond.
+    """
+    if not portrait:
+        return None
+    path = safe_join(PORTRAIT_DIR, portrait)
+    if path is None:
+        return None
+    try:
+        digest = source_digest(path)
+    except OSError:
+        return f"/static/portraits/{quote(portrait)}"
+    return f"/portraits/{digest[:12]}/{variant}/{quote(portrait)}"
+
+# --- Atlas des icônes de statut ---
+# Les icônes des statuts ('models.STATUS_EFFECTS') sont regroupées dans une seule feuille de style,
+# chaque icône y étant intégrée en 'data:' URI sous une classe CSS. Une page charge ainsi une seule
+# ressource (mise en cache sans revalidation) quel que soit le nombre de statuts affichés, et un
+# nouveau rendu d'une vue ne déclenche aucun chargement d'image.
+
+# Taille maximale (en pixels) des icônes de l'atlas : 50 px dans la vue portrait,
+# doublés pour les écrans haute densité. Nécessite Pillow ; sinon, les icônes gardent leur taille.
+ATLAS_ICON_SIZE = 100
+
+# Atlas courant et liste des statuts dont il a été construit.
+_atlas = {'names': None}
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+# Blocs PNG nécessaires à l'affichage ; les autres (métadonnées, profil de couleur) sont retirés.
+PNG_KEPT_CHUNKS = {b'IHDR', b'PLTE', b'tRNS', b'IDAT', b'IEND'}
+
+def _strip_png_metadata(data):
+    """
+    Retire d'un fichier PNG les blocs de métadonnées (textes, profil ICC, etc.).
+    Les icônes fournies en contiennent plus que d'image ; certaines ont même un profil ICC
+    à la somme de contrôle invalide, que Pillow refuse de lire.
+    """
+    if not data.startswith(PNG_SIGNATURE):
+        return data
+    chunks = [PNG_SIGNATURE]
+    pos = len(PNG_SIGNATURE)
+    while pos + 8 <= len(data):
+        length, chunk_type = struct.unpack('>I4s', data[pos:pos + 8])
+        end = pos + 12 + length # Longueur, type, données, somme de contrôle.
+        if chunk_type in PNG_KEPT_CHUNKS:
+            chunks.append(data[pos:end])
+        pos = end
+    return b''.join(chunks)
+
+def _icon_png(path):
+    """
+    Retourne le contenu PNG d'une icône, sans métadonnées, et réduite à 'ATLAS_ICON_SIZE'
+    si Pillow est installé.
+    """
+    with open(path, 'rb') as f:
+        data = _strip_png_metadata(f.read())
+    if Image is None:
+        return data
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image.thumbnail((ATLAS_ICON_SIZE, ATLAS_ICON_SIZE), Image.LANCZOS)
+            buffer = io.BytesIO()
+            image.save(buffer, 'PNG', optimize=True)
+            return buffer.getvalue()
+    except (OSError, SyntaxError, ValueError):
+        return data # Image illisible par Pillow : intégrée telle quelle, le navigateur la décodera.
+
+def build_icon_atlas(status_names):
+    """
+    Construit la feuille de style de l'atlas des icônes.
+
+    Returns:
+        dict: 'css' (la feuille de style), 'fingerprint' (son empreinte) et 'classes'
+              (nom du statut -> classe CSS de son icône, pour les statuts qui ont une icône).
+    """
+    rules = ['.status-sprite{display:inline-block;background:center/contain no-repeat}']
+    classes = {}
+    for index, name in enumerate(status_names):
+        path = os.path.join(app.static_folder, 'icons', f"{name}.png")
+        if not os.path.isfile(path):
+            continue # Pas d'icône : les vues affichent l'initiale du statut.
+        classes[name] = f"status-sprite-{index}"
+        data = base64.b64encode(_icon_png(path)).decode('ascii')
+        rules.append(f'.status-sprite-{index}{{background-image:url("data:image/png;base64,{data}")}}')
+    css = '\n'.join(rules) + '\n'
+    return {'css': css, 'fingerprint': hashlib.sha256(css.encode('utf-8')).hexdigest()[:12], 'classes': classes}
+
+def icon_atlas(status_names):
+    """
+    Retourne l'atlas des icônes des statuts 'status_names' (voir 'build_icon_atlas()'),
+    avec son URL ('url'). L'atlas est reconstruit si la liste des statuts a changé.
+    """
+    names = tuple(status_names)
+    if _atlas['names'] != names:
+        atlas = build_icon_atlas(names)
+        atlas['url'] = f"/icons/{atlas['fingerprint']}.css"
+        atlas['names'] = names
+        _atlas.clear()
+        _atlas.update(atlas)
+    return _atlas
+
+app.add_template_global(asset_url)
+app.add_template_global(portrait_url)
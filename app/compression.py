@@ -0,0 +1,96 @@
+import zlib
+from flask import request, g
+from app import app
+
+# Compression Brotli : optionnelle ('pip install brotli'). Sans elle, seul gzip est proposé.
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# --- Compression des réponses HTTP ---
+# Les réponses HTML, JSON et texte d'au moins 'COMPRESS_MIN_SIZE' octets sont compressées avec le
+# meilleur encodage accepté par le client ('Accept-Encoding') : Brotli si disponible, sinon gzip.
+# Les réponses qui ne dépendent que de la révision de l'état de leur table (vues partielles,
+# '/api/state') sont compressées une seule fois par révision : voir 'cache_per_revision()'.
+# Les fichiers statiques, servis tels quels depuis le disque, ne sont pas compressés.
+
+# Encodages proposés, par ordre de préférence à qualité égale pour le client.
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+COMPRESSIBLE_TYPES = {'text/html', 'application/json', 'text/plain', 'text/css', 'application/javascript',
+                      'image/svg+xml'}
+# Niveaux de compression : un compromis entre taille et temps de compression à chaque révision.
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+# Corps compressés, par table : {identifiant de table: (révision, {(clé, encodage): corps compressé})}.
+_cache = {}
+
+# Compteurs : 'compressed' réponses compressées (dont 'cache_hits' depuis le cache),
+# 'bytes_in' et 'bytes_out' tailles avant et après compression.
+stats = {'compressed': 0, 'cache_hits': 0, 'bytes_in': 0, 'bytes_out': 0}
+
+def compress(body, encoding):
+    """Compresse 'body' (bytes) avec l'encodage 'encoding' ('br' ou 'gzip')."""
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    # En-tête gzip sans date : deux compressions du même corps donnent les mêmes octets.
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(body) + compressor.flush()
+
+def cache_per_revision():
+    """
+    Indique que la réponse de la requête en cours ne dépend que de son URL et de la révision de l'état
+    de sa table ('g.table') : son corps compressé est mis en cache jusqu'au prochain changement d'état.
+    """
+    g.compress_key = request.full_path
+
+def etag_matches(etag):
+    """Indique si le client a déjà la réponse d'ETag 'etag', dans l'un des encodages (voir '_compress_response')."""
+    if_none_match = request.if_none_match
+    return etag in if_none_match or any(f"{etag}-{encoding}" in if_none_match for encoding in ENCODINGS)
+
+def _compressed_body(response, encoding):
+    key = g.get('compress_key')
+    table = g.get('table')
+    if key is None or table is None:
+        return compress(response.get_data(), encoding)
+    cached_revision, bodies = _cache.get(table.id, (None, None))
+    if cached_revision != table.state_revision:
+        bodies = {}
+        _cache[table.id] = (table.state_revision, bodies)
+    body = bodies.get((key, encoding))
+    if body is None:
+        body = bodies[(key, encoding)] = compress(response.get_data(), encoding)
+    else:
+        stats['cache_hits'] += 1
+    return body
+
+@app.after_request
+def _compress_response(response):
+    """
+    Compresse la réponse si son type s'y prête, si elle est assez grande et si le client accepte
+    un des encodages. L'ETag d'une réponse compressée est suffixé par l'encodage : deux encodages
+    d'une même réponse sont des représentations différentes pour les caches HTTP.
+    """
+    if (not app.config['COMPRESSION'] or response.status_code != 200 or response.direct_passthrough
+            or response.is_streamed or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_TYPES):
+        return response
+    size = response.content_length
+    if size is None or size < app.config['COMPRESS_MIN_SIZE']:
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = request.accept_encodings.best_match(ENCODINGS)
+    if encoding is None:
+        return response
+    body = _compressed_body(response, encoding)
+    stats['compressed'] += 1
+    stats['bytes_in'] += size
+    stats['bytes_out'] += len(body)
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag is not None:
+        response.set_etag(f"{etag}-{encoding}", weak)
+    return response
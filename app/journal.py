@@ -0,0 +1,189 @@
+import os
+import json
+import threading
+from app import socketio, metrics
+
+# --- Journal des événements ---
+# Chaque delta émis par une table (voir 'Tracker.flush_state()') est ajouté à un journal
+# sur disque, en mode ajout seul. Au redémarrage, l'état de chaque table est reconstruit
+# à partir de son dernier instantané complet et des événements qui le suivent.
+#
+# Organisation sur disque, pour chaque table :
+# - '<dossier>/<table>/snapshot.json' : le dernier instantané complet ('Tracker.to_state()') ;
+# - '<dossier>/<table>/events.log' : les deltas émis depuis cet instantané, un objet JSON par ligne.
+#
+# Un ajout se limite à une écriture dans le fichier (sans attendre le disque) : les appels à
+# fsync sont regroupés toutes les 'fsync_interval' secondes. Tous les 'snapshot_every'
+# événements, un nouvel instantané est écrit et le journal de la table est vidé.
+
+SNAPSHOT_FILE = 'snapshot.json'
+EVENTS_FILE = 'events.log'
+# Champs des participants d'un delta calculés pour les clients ('models.participant_payload()'),
+# absents de l'état sérialisé.
+DERIVED_FIELDS = ('status', 'portrait_url')
+
+
+def _dump(data):
+    """Sérialisation JSON compacte, sur une seule ligne."""
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+
+
+def _apply_event(state, event):
+    """
+    Applique un delta du journal à un état sérialisé ('Tracker.to_state()').
+    Les participants sont indexés par identifiant dans 'state['participants']'.
+    """
+    participants = state['participants']
+    for data in event.get('upsert', ()):
+        participants[data['id']] = {key: value for key, value in data.items() if key not in DERIVED_FIELDS}
+    for participant_id in event.get('remove', ()):
+        participants.pop(participant_id, None)
+    if 'order' in event:
+        state['published_order'] = event['order']
+    state['turn'] = event['turn']
+    state['rev'] = state['published_rev'] = event['rev']
+
+
+class EventJournal:
+    """
+    Journal des événements des tables, avec instantanés périodiques et reprise après un arrêt brutal.
+    """
+    def __init__(self, directory, fsync_interval=1.0, snapshot_every=1000):
+        """
+        Args:
+            directory (str): Le dossier du journal.
+            fsync_interval (float, optional): Délai (en secondes) entre deux synchronisations
+                sur disque. À 0, chaque événement est synchronisé immédiatement.
+            snapshot_every (int, optional): Le nombre d'événements d'une table au-delà duquel
+                un nouvel instantané est écrit et son journal vidé.
+        """
+        self.directory = directory
+        self.fsync_interval = fsync_interval
+        self.snapshot_every = snapshot_every
+        os.makedirs(directory, exist_ok=True)
+        self._files = {}
+        # Nombre d'événements dans le journal de chaque table depuis son dernier instantané.
+        self._event_counts = {}
+        self._unsynced = set()
+        self._sync_scheduled = False
+        self._lock = threading.Lock()
+
+    def _path(self, table_id, name):
+        return os.path.join(self.directory, table_id, name)
+
+    def _events_file(self, table_id):
+        """Retourne le fichier du journal de la table, ouvert en ajout."""
+        f = self._files.get(table_id)
+        if f is None:
+            os.makedirs(os.path.join(self.directory, table_id), exist_ok=True)
+            f = self._files[table_id] = open(self._path(table_id, EVENTS_FILE), 'a', encoding='utf-8')
+        return f
+
+    def append(self, table, event):
+        """
+        Ajoute un événement (un delta émis) au journal de la table.
+        L'écriture est transmise au système sans attendre le disque ; la synchronisation
+        est faite par lots, ou immédiatement si 'fsync_interval' vaut 0.
+        """
+        with self._lock, metrics.PERSISTENCE_DURATION.time('journal_append'):
+            f = self._events_file(table.id)
+            f.write(_dump(event) + '\n')
+            f.flush()
+            count = self._event_counts[table.id] = self._event_counts.get(table.id, 0) + 1
+            if count >= self.snapshot_every:
+                self._write_snapshot(table)
+            elif self.fsync_interval <= 0:
+                os.fsync(f.fileno())
+            else:
+                self._unsynced.add(table.id)
+                if not self._sync_scheduled:
+                    self._sync_scheduled = True
+                    socketio.start_background_task(self._sync_after_interval)
+
+    def snapshot(self, table):
+        """Écrit un instantané complet de la table et vide son journal."""
+        with self._lock, metrics.PERSISTENCE_DURATION.time('journal_snapshot'):
+            self._write_snapshot(table)
+
+    def _write_snapshot(self, table):
+        """
+        Écrit l'instantané dans un fichier temporaire, le synchronise puis le renomme :
+        un arrêt pendant l'écriture laisse l'instantané précédent intact. Le journal n'est
+        vidé qu'ensuite ; les événements déjà couverts par l'instantané sont ignorés à la reprise.
+        """
+        os.makedirs(os.path.join(self.directory, table.id), exist_ok=True)
+        path = self._path(table.id, SNAPSHOT_FILE)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            f.write(_dump(table.to_state()))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + '.tmp', path)
+        events = self._events_file(table.id)
+        events.truncate(0)
+        os.fsync(events.fileno())
+        self._event_counts[table.id] = 0
+        self._unsynced.discard(table.id)
+
+    def sync(self):
+        """Synchronise sur disque les journaux écrits depuis la dernière synchronisation."""
+        with self._lock, metrics.PERSISTENCE_DURATION.time('journal_sync'):
+            for table_id in self._unsynced:
+                os.fsync(self._files[table_id].fileno())
+            self._unsynced.clear()
+
+    def _sync_after_interval(self):
+        """Tâche de fond : synchronise les journaux après 'fsync_interval' secondes."""
+        socketio.sleep(self.fsync_interval)
+        self._sync_scheduled = False
+        self.sync()
+
+    def recover(self, tracker_class):
+        """
+        Reconstruit l'état de toutes les tables présentes dans le journal.
+
+        Pour chaque table, l'instantané est chargé puis les événements postérieurs sont rejoués.
+        Une dernière ligne incomplète (arrêt pendant une écriture) est ignorée et retirée du journal.
+
+        Args:
+            tracker_class (type): La classe d'état d'une table ('models.Tracker').
+
+        Returns:
+            list: Les tables reconstruites.
+        """
+        tables = []
+        for table_id in sorted(os.listdir(self.directory)):
+            if not os.path.isdir(os.path.join(self.directory, table_id)):
+                continue
+            state = {'rev': 0, 'published_rev': 0, 'published_order': [], 'turn': 0, 'participants': []}
+            snapshot_path = self._path(table_id, SNAPSHOT_FILE)
+            if os.path.exists(snapshot_path):
+                with open(snapshot_path, 'r', encoding='utf-8') as f:
+                    state = json.load(f)
+            state['participants'] = {p['id']: p for p in state['participants']}
+
+            events = []
+            events_path = self._path(table_id, EVENTS_FILE)
+            if os.path.exists(events_path):
+                with open(events_path, 'rb') as f:
+                    valid_size = 0
+                    for line in f:
+                        if not line.endswith(b'\n'):
+                            break
+                        try:
+                            event = json.loads(line)
+                        except ValueError:
+                            break
+                        valid_size += len(line)
+                        if event['rev'] > state['rev']:
+                            _apply_event(state, event)
+                            events.append(event)
+                if valid_size < os.path.getsize(events_path):
+                    os.truncate(events_path, valid_size)
+            self._event_counts[table_id] = len(events)
+
+            by_id = state['participants']
+            state['participants'] = [by_id[pid] for pid in state['published_order']]
+            table = tracker_class.from_state(table_id, state)
+            table.delta_history.extend(events)
+            tables.append(table)
+        return tables
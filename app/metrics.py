@@ -0,0 +1,160 @@
+import logging
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from flask import request, g
+from app import app
+
+logger = logging.getLogger(__name__)
+
+# --- Mesures d'exécution ---
+# Compteurs, jauges et histogrammes tenus en mémoire par le processus serveur et exposés au
+# format texte de Prometheus par la route '/metrics' (voir 'render()'). Avec plusieurs processus
+# serveur (état partagé dans Redis), chaque processus expose ses propres mesures.
+
+# Bornes (en secondes) des histogrammes de durée.
+DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Toutes les mesures déclarées, dans l'ordre d'exposition.
+REGISTRY = []
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Compteur croissant, par combinaison de valeurs d'étiquettes."""
+    kind = 'counter'
+
+    def __init__(self, name, description, labels=()):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.values = {}
+        REGISTRY.append(self)
+
+    def inc(self, *label_values, amount=1):
+        self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def samples(self):
+        for label_values, value in sorted(self.values.items()):
+            yield f"{self.name}{_format_labels(self.labels, label_values)} {_format_value(value)}"
+
+
+class Gauge(Counter):
+    """Valeur instantanée, qui peut monter ou descendre."""
+    kind = 'gauge'
+
+    def set(self, value, *label_values):
+        self.values[label_values] = value
+
+    def dec(self, *label_values, amount=1):
+        self.inc(*label_values, amount=-amount)
+
+
+class Histogram:
+    """Répartition de valeurs observées (des durées, en secondes) dans des intervalles fixes."""
+    kind = 'histogram'
+
+    def __init__(self, name, description, labels=(), buckets=DURATION_BUCKETS):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        # Par combinaison d'étiquettes : [effectif de chaque intervalle (+ au-delà), somme].
+        self.values = {}
+        REGISTRY.append(self)
+
+    def observe(self, value, *label_values):
+        entry = self.values.get(label_values)
+        if entry is None:
+            entry = self.values[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+        entry[0][bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+
+    @contextmanager
+    def time(self, *label_values):
+        """Observe la durée du bloc 'with'."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *label_values)
+
+    def samples(self):
+        for label_values, (counts, total) in sorted(self.values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                labels = _format_labels(self.labels, label_values, [('le', _format_value(bound))])
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labels, label_values)
+            yield f"{self.name}_sum{labels} {_format_value(total)}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+def render():
+    """Retourne toutes les mesures au format texte de Prometheus (version 0.0.4)."""
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.description}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.samples())
+    return '\n'.join(lines) + '\n'
+
+
+# --- Mesures du serveur ---
+
+REQUESTS = Counter('webtracker_http_requests_total', "Requêtes HTTP traitées.", ('endpoint', 'method', 'status'))
+REQUEST_DURATION = Histogram('webtracker_http_request_duration_seconds',
+                             "Durée de traitement des requêtes HTTP, diffusion des deltas comprise.", ('endpoint',))
+RENDER_DURATION = Histogram('webtracker_template_render_seconds', "Durée de rendu des vues partielles.", ('template',))
+BROADCASTS = Counter('webtracker_broadcast_emissions_total', "Messages Socket.IO diffusés aux salles des tables.", ('event',))
+BROADCAST_RECIPIENTS = Counter('webtracker_broadcast_recipients_total',
+                               "Clients Socket.IO (de ce processus) destinataires des diffusions.", ('event',))
+SOCKET_CLIENTS = Gauge('webtracker_socketio_clients', "Clients Socket.IO connectés à une table, par vue.", ('view',))
+PARTICIPANTS = Gauge('webtracker_participants', "Participants de chaque table, au dernier delta émis.", ('table',))
+PERSISTENCE_DURATION = Histogram('webtracker_persistence_seconds',
+                                 "Durée des entrées/sorties de persistance (sauvegardes, journal, stockage d'état).",
+                                 ('operation',))
+
+def endpoint_name():
+    """Nom de la route de la requête, le même avec ou sans préfixe de table ('/t/<table_id>')."""
+    return request.endpoint.rsplit('.', 1)[-1] if request.endpoint else 'not_found'
+
+@app.before_request
+def _start_request_timer():
+    g.metrics_start = time.perf_counter()
+
+@app.after_request
+def _record_status(response):
+    g.metrics_status = response.status_code
+    return response
+
+@app.teardown_request
+def _record_request(exc):
+    """
+    Compte la requête et observe sa durée. Ce gestionnaire est enregistré avant celui qui
+    diffuse les deltas ('models._flush_after_request') : il s'exécute après lui.
+    """
+    start = g.pop('metrics_start', None)
+    if start is None:
+        return
+    duration = time.perf_counter() - start
+    status = g.pop('metrics_status', 500)
+    endpoint = endpoint_name()
+    REQUESTS.inc(endpoint, request.method, str(status))
+    REQUEST_DURATION.observe(duration, endpoint)
+    logger.debug("Requête endpoint=%s method=%s status=%s duration_ms=%.1f",
+                 endpoint, request.method, status, duration * 1000)
@@ -1,6 +1,14 @@
 import os
+import hashlib
+import tempfile
+import time
 from pathlib import Path
 
+try:
+    from PIL import Image, ImageOps, features
+except ImportError: # Dépendance optionnelle : sans Pillow, les originaux sont servis tels quels.
+    Image = None
+
 def get_portraits_and_folders(base_dir, rel_path=''):
     """
     Récupère une liste de sous-dossiers et d'images à partir d'un répertoire de base
@@ -55,3 +63,213 @@ def get_portraits_and_folders(base_dir, rel_path=''):
         "folders": folders,
         "images": images
     }
+
+
+
+# --- Index des portraits ---
+# 'get_portraits_and_folders()' relit le dossier et interroge le système de fichiers pour chaque
+# entrée à chaque appel. L'index garde en mémoire le contenu de chaque dossier déjà parcouru
+# et ne relit un dossier que si sa date de modification a changé (ajout, suppression ou
+# renommage d'une entrée). Il permet aussi de chercher un portrait dans tous les dossiers.
+
+# Extensions de fichiers reconnues comme des images.
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp', '.tiff'}
+# Nombre d'images par page par défaut et maximal pour les listes paginées et la recherche.
+PORTRAITS_PER_PAGE = 100
+MAX_PORTRAITS_PER_PAGE = 500
+# Un dossier modifié moins de deux secondes avant sa lecture est relu à la demande suivante :
+# une modification faite dans la même unité de temps que la lecture ne changerait pas sa date.
+_RACY_WINDOW_NS = 2 * 10**9
+
+def paginate(items, page=1, per_page=PORTRAITS_PER_PAGE):
+    """
+    Retourne une page d'une liste.
+
+    Returns:
+        dict: Les éléments de la page ('items'), le nombre total d'éléments ('total'),
+              le numéro de page et la taille de page effectivement utilisés.
+    """
+    page = max(page, 1)
+    per_page = min(max(per_page, 1), MAX_PORTRAITS_PER_PAGE)
+    start = (page - 1) * per_page
+    return {'items': items[start:start + per_page], 'total': len(items), 'page': page, 'per_page': per_page}
+
+
+class PortraitIndex:
+    """
+    Index en mémoire de l'arborescence des portraits, construit avec 'os.scandir'.
+
+    Pour chaque dossier parcouru, l'index garde sa date de modification, ses sous-dossiers et ses
+    images (triés). Les chemins relatifs utilisent '/' comme séparateur, comme dans les URL.
+    """
+    def __init__(self, base_dir):
+        """
+        Args:
+            base_dir (str): Le chemin absolu du répertoire racine des portraits.
+        """
+        self.base_dir = base_dir
+        # Chemin relatif du dossier -> (date de modification, relecture forcée, dossiers, images).
+        self._dirs = {}
+        # Liste de tous les portraits (chemin relatif en minuscules, chemin relatif), pour la recherche.
+        self._all_images = None
+
+    def _scan(self, rel_path, mtime_ns):
+        """Lit le contenu d'un dossier et le met en cache."""
+        folders = []
+        images = []
+        with os.scandir(os.path.join(self.base_dir, rel_path)) as entries:
+            for entry in entries:
+                # 'is_dir()' et 'is_file()' utilisent le type d'entrée renvoyé par scandir, sans stat.
+                if entry.is_dir():
+                    folders.append(entry.name)
+                elif entry.is_file() and os.path.splitext(entry.name)[1].lower() in IMAGE_EXTENSIONS:
+                    images.append(entry.name)
+        folders.sort()
+        images.sort()
+        racy = mtime_ns >= time.time_ns() - _RACY_WINDOW_NS
+        cached = self._dirs[rel_path] = (mtime_ns, racy, folders, images)
+        self._all_images = None
+        return cached
+
+    def _fresh(self, rel_path):
+        """Retourne le contenu à jour d'un dossier, ou None si ce n'est pas un dossier."""
+        try:
+            mtime_ns = os.stat(os.path.join(self.base_dir, rel_path)).st_mtime_ns
+            cached = self._dirs.get(rel_path)
+            if cached is None or cached[1] or cached[0] != mtime_ns:
+                cached = self._scan(rel_path, mtime_ns)
+            return cached
+        except (FileNotFoundError, NotADirectoryError):
+            if self._dirs.pop(rel_path, None) is not None:
+                self._all_images = None
+            return None
+
+    def listing(self, rel_path=''):
+        """
+        Retourne les sous-dossiers et les images d'un dossier, comme 'get_portraits_and_folders()'.
+        Seul le dossier demandé est vérifié : un seul appel système s'il n'a pas changé.
+        """
+        cached = self._fresh(rel_path.strip('/'))
+        if cached is None:
+            return {"folders": [], "images": []}
+        return {"folders": list(cached[2]), "images": list(cached[3])}
+
+    def refresh(self):
+        """Met à jour tout l'index : seuls les dossiers dont la date de modification a changé sont relus."""
+        seen = set()
+        pending = ['']
+        while pending:
+            rel_path = pending.pop()
+            cached = self._fresh(rel_path)
+            if cached is None:
+                continue
+            seen.add(rel_path)
+            pending.extend(f"{rel_path}/{folder}" if rel_path else folder for folder in cached[2])
+        for rel_path in [p for p in self._dirs if p not in seen]:
+            del self._dirs[rel_path]
+            self._all_images = None
+
+    def search(self, query, page=1, per_page=PORTRAITS_PER_PAGE):
+        """
+        Cherche des portraits dans tous les dossiers : 'query' est cherché (sans tenir compte
+        de la casse) dans le chemin relatif de chaque image, dossiers compris.
+
+        Returns:
+            dict: La page de résultats (voir 'paginate()'), les éléments étant des chemins relatifs.
+        """
+        self.refresh()
+        if self._all_images is None:
+            all_images = []
+            for rel_path, (_, _, _, images) in self._dirs.items():
+                for image in images:
+                    path = f"{rel_path}/{image}" if rel_path else image
+                    all_images.append((path.casefold(), path))
+            all_images.sort()
+            self._all_images = all_images
+        query = query.strip().casefold()
+        return paginate([path for key, path in self._all_images if query in key], page, per_page)
+
+
+# --- Variantes des portraits (miniatures et taille d'affichage) ---
+# Les portraits originaux peuvent être très lourds. Pour la grille de sélection et la vue portrait,
+# on sert des variantes redimensionnées, générées à la première demande puis conservées dans un
+# cache sur disque. Le nom d'une variante dérive du contenu de l'original (empreinte SHA-256) :
+# un original modifié produit une nouvelle empreinte, donc une nouvelle variante.
+
+# Taille (en pixels) du plus petit côté de chaque variante. L'image couvre ainsi une boîte carrée
+# de cette taille ('object-fit: cover') : 150 px dans la grille de sélection, 512 px dans la vue
+# portrait, doublés pour les écrans haute densité.
+PORTRAIT_VARIANTS = {
+    'thumb': 300,
+    'display': 1024,
+}
+
+# Empreintes déjà calculées : chemin de l'original -> (date de modification, taille, empreinte).
+_digests = {}
+
+def variant_format():
+    """Retourne le format d'image des variantes et son extension : WebP si Pillow le gère, sinon JPEG."""
+    if features.check('webp'):
+        return 'WEBP', '.webp'
+    return 'JPEG', '.jpg'
+
+def source_digest(source_path):
+    """
+    Retourne l'empreinte SHA-256 du contenu d'un portrait original.
+    L'empreinte n'est recalculée que si la date de modification ou la taille du fichier a changé.
+    """
+    stat = os.stat(source_path)
+    cached = _digests.get(source_path)
+    if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        return cached[2]
+    sha = hashlib.sha256()
+    with open(source_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            sha.update(chunk)
+    digest = sha.hexdigest()
+    _digests[source_path] = (stat.st_mtime_ns, stat.st_size, digest)
+    return digest
+
+def get_portrait_variant(source_path, variant, cache_dir):
+    """
+    Retourne le chemin de la variante 'variant' d'un portrait, en la générant si elle n'est pas en cache.
+
+    Args:
+        source_path (str): Le chemin absolu du portrait original.
+        variant (str): Le nom de la variante (une clé de 'PORTRAIT_VARIANTS').
+        cache_dir (str): Le dossier du cache des variantes.
+
+    Returns:
+        str: Le chemin de la variante, ou celui de l'original si Pillow n'est pas installé
+             ou si l'image ne peut pas être lue.
+    """
+    if Image is None:
+        return source_path
+    digest = source_digest(source_path)
+    image_format, extension = variant_format()
+    variant_path = os.path.join(cache_dir, digest[:2], f"{digest}-{variant}{extension}")
+    if os.path.exists(variant_path):
+        return variant_path
+
+    try:
+        with Image.open(source_path) as image:
+            image = ImageOps.exif_transpose(image)
+            short_side = PORTRAIT_VARIANTS[variant]
+            scale = short_side / min(image.size)
+            if scale < 1: # On ne fait jamais grossir une image.
+                image = image.resize((round(image.width * scale), round(image.height * scale)), Image.LANCZOS)
+            if image_format == 'JPEG' or image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA' if image_format == 'WEBP' and 'A' in image.getbands() else 'RGB')
+            os.makedirs(os.path.dirname(variant_path), exist_ok=True)
+            # Écriture atomique : une requête concurrente ne voit jamais une variante incomplète.
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(variant_path), suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    image.save(f, image_format, quality=82)
+                os.replace(tmp_path, variant_path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+    except OSError:
+        return source_path
+    return variant_path
@@ -0,0 +1,186 @@
+import sys
+import signal
+import random
+import logging
+import threading
+from functools import wraps
+from flask import g
+from app import app
+from app.metrics import endpoint_name
+
+logger = logging.getLogger(__name__)
+
+# --- Profilage par échantillonnage ---
+# Quand le profilage est actif, un minuteur système ('setitimer', temps CPU du processus) interrompt
+# le serveur toutes les 'interval' secondes et relève la pile d'appels en cours d'exécution.
+# Seule une fraction ('rate') des requêtes HTTP et des messages Socket.IO est suivie : les piles
+# relevées pendant leur traitement sont comptées sous le nom de leur route. Les piles relevées en
+# dehors de tout traitement suivi (boucle d'événements d'eventlet, tâches de fond, requêtes non tirées
+# au sort) sont comptées sous OUTSIDE.
+#
+# Les résultats sont exportés au format des piles repliées ('collapsed stacks') lu par flamegraph.pl,
+# speedscope ou inferno : une ligne 'route;fonction;fonction... nombre' par pile distincte.
+#
+# Profilage inactif, le coût se limite à un test par requête : le minuteur est arrêté.
+
+OUTSIDE = '(hors requête)'
+# Profondeur maximale des piles relevées (les appels les plus anciens sont ignorés au-delà).
+MAX_DEPTH = 128
+
+# Le minuteur et son signal n'existent pas sur Windows : le profilage y est indisponible.
+available = hasattr(signal, 'setitimer')
+
+# Réglages courants : fraction des requêtes suivies (0 : profilage inactif) et intervalle entre deux relevés.
+settings = {'rate': 0.0, 'interval': 0.005}
+
+# Traitements suivis en cours, par identifiant de thread (de greenlet avec eventlet) : {ident: route}.
+_active = {}
+
+# Piles relevées : {route: {pile (tuple d'objets code, de l'appel le plus ancien au plus récent): nombre}}.
+_samples = {}
+
+# Nombre de traitements suivis, par route.
+_sampled_calls = {}
+
+def _record(route, frame):
+    stack = []
+    while frame is not None and len(stack) < MAX_DEPTH:
+        stack.append(frame.f_code)
+        frame = frame.f_back
+    stack.reverse()
+    counts = _samples.setdefault(route, {})
+    key = tuple(stack)
+    counts[key] = counts.get(key, 0) + 1
+
+def _sample(signum, frame):
+    """
+    Gestionnaire du signal du minuteur. Le signal est traité par le thread principal :
+    'frame' est la pile qu'il exécutait (avec eventlet, celle du greenlet en cours).
+    Les piles des autres threads suivis (serveur en threads, sans eventlet) sont lues
+    avec 'sys._current_frames()' ; un greenlet suivi mais suspendu n'occupe pas le processeur
+    et n'est pas compté.
+    """
+    current = threading.get_ident()
+    frames = None
+    for ident, route in list(_active.items()):
+        if ident == current:
+            _record(route, frame)
+            continue
+        if frames is None:
+            frames = sys._current_frames()
+        other = frames.get(ident)
+        if other is not None:
+            _record(route, other)
+    if current not in _active:
+        _record(OUTSIDE, frame)
+
+if available:
+    try:
+        signal.signal(signal.SIGPROF, _sample)
+    except ValueError:
+        # Le gestionnaire ne peut être installé que depuis le thread principal.
+        available = False
+
+def configure(rate=None, interval=None):
+    """
+    Change les réglages du profilage et démarre ou arrête le minuteur en conséquence.
+
+    Args:
+        rate (float, optional): Fraction des requêtes et messages suivis, de 0 (inactif) à 1.
+        interval (float, optional): Intervalle (en secondes de temps CPU) entre deux relevés.
+
+    Raises:
+        ValueError: Si un réglage est hors limites, ou si le profilage est demandé sur une
+            plateforme qui ne le permet pas.
+    """
+    rate = settings['rate'] if rate is None else float(rate)
+    interval = settings['interval'] if interval is None else float(interval)
+    if not 0 <= rate <= 1:
+        raise ValueError("La fraction échantillonnée doit être comprise entre 0 et 1.")
+    if not 0.0001 <= interval <= 1:
+        raise ValueError("L'intervalle doit être compris entre 0.0001 et 1 seconde.")
+    if rate and not available:
+        raise ValueError("Le profilage n'est pas disponible sur cette plateforme.")
+    settings['rate'], settings['interval'] = rate, interval
+    if available:
+        signal.setitimer(signal.ITIMER_PROF, interval if rate else 0, interval if rate else 0)
+    logger.info("Profilage rate=%s interval=%s", rate, interval)
+
+def reset():
+    """Oublie les piles relevées."""
+    _samples.clear()
+    _sampled_calls.clear()
+
+def _start(route):
+    """Tire au sort le traitement en cours ; retourne True s'il est suivi."""
+    rate = settings['rate']
+    if not rate or random.random() >= rate:
+        return False
+    _active[threading.get_ident()] = route
+    _sampled_calls[route] = _sampled_calls.get(route, 0) + 1
+    return True
+
+def _stop():
+    _active.pop(threading.get_ident(), None)
+
+def sampled(route):
+    """Décorateur pour les gestionnaires Socket.IO : leur traitement peut être suivi sous le nom 'route'."""
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            if not _start(route):
+                return f(*args, **kwargs)
+            try:
+                return f(*args, **kwargs)
+            finally:
+                _stop()
+        return wrapper
+    return decorator
+
+def _frame_name(code):
+    # Fichier réduit à son dossier et son nom : 'app/models.py', 'jinja2/runtime.py'...
+    filename = '/'.join(code.co_filename.replace('\\', '/').rsplit('/', 2)[-2:])
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+def collapsed(route=None):
+    """
+    Retourne les piles relevées au format des piles repliées, la route en premier élément de chaque pile.
+
+    Args:
+        route (str, optional): Si indiquée, seules les piles de cette route sont retournées.
+    """
+    lines = []
+    for name, counts in sorted(_samples.items()):
+        if route is not None and name != route:
+            continue
+        for stack, count in counts.items():
+            lines.append(';'.join([name] + [_frame_name(code) for code in stack]) + f" {count}")
+    return '\n'.join(sorted(lines)) + ('\n' if lines else '')
+
+def summary():
+    """État du profilage et, par route, le nombre de traitements suivis et de piles relevées."""
+    return {
+        'available': available,
+        'enabled': bool(settings['rate']),
+        'rate': settings['rate'],
+        'interval': settings['interval'],
+        'routes': {name: {'sampled': _sampled_calls.get(name, 0), 'samples': sum(_samples.get(name, {}).values())}
+                   for name in sorted(set(_samples) | set(_sampled_calls))},
+    }
+
+@app.before_request
+def _start_request_profile():
+    if settings['rate'] and _start(endpoint_name()):
+        g.profiled = True
+
+@app.teardown_request
+def _stop_request_profile(exc):
+    """
+    Enregistré avant 'models._flush_after_request' : il s'exécute après lui, et la diffusion
+    des deltas de la requête est comprise dans ses piles.
+    """
+    if g.pop('profiled', False):
+        _stop()
+
+if app.config['PROFILE_RATE']:
+    configure(app.config['PROFILE_RATE'], app.config['PROFILE_INTERVAL'])
@@ -0,0 +1,63 @@
+import uuid
+from flask import render_template, make_response, g
+from app import metrics, compression
+
+# --- Cache des vues partielles ---
+# Tous les clients d'une table reçoivent le même HTML pour une même révision de son état :
+# chaque vue partielle est rendue une seule fois par table et par révision, puis servie depuis le cache.
+
+# Identifiant propre à ce processus, inclus dans les ETag pour qu'un ETag
+# obtenu avant un redémarrage du serveur ne soit jamais considéré comme valide.
+_EPOCH = uuid.uuid4().hex[:8]
+
+# Rendus en cache, par table : {identifiant de table: (révision, {nom du template: (html, etag)})}.
+_cache = {}
+
+# Compteurs : 'renders' rendus effectifs, 'hits' réponses servies depuis le cache,
+# 'not_modified' réponses 304 (le client avait déjà la bonne version).
+stats = {'renders': 0, 'hits': 0, 'not_modified': 0}
+
+def render_cached(template_name, **context):
+    """
+    Retourne une réponse contenant le rendu de 'template_name' pour la révision courante
+    de la table de la requête ('g.table').
+
+    Le rendu est mis en cache et réutilisé tant que la révision de l'état de la table ne change pas.
+    La réponse porte un ETag : si le client envoie le même ETag ('If-None-Match'),
+    une réponse 304 vide est retournée.
+
+    Args:
+        template_name (str): Le nom du template partiel à rendre.
+        **context: Les variables passées au template lors du rendu.
+
+    Returns:
+        Response: La réponse HTTP (200 avec le HTML, ou 304).
+    """
+    table = g.table
+    revision = table.state_revision
+    cached_revision, rendered = _cache.get(table.id, (None, None))
+    if revision != cached_revision:
+        # L'état de la table a changé : tous ses rendus en cache sont périmés.
+        rendered = {}
+        _cache[table.id] = (revision, rendered)
+
+    entry = rendered.get(template_name)
+    if entry is None:
+        with metrics.RENDER_DURATION.time(template_name):
+            html = render_template(template_name, **context)
+        entry = rendered[template_name] = (html, f"{_EPOCH}-{table.id}-{revision}-{template_name}")
+        stats['renders'] += 1
+    else:
+        stats['hits'] += 1
+
+    html, etag = entry
+    compression.cache_per_revision()
+    if compression.etag_matches(etag):
+        stats['not_modified'] += 1
+        response = make_response('', 304)
+    else:
+        response = make_response(html)
+    response.set_etag(etag)
+    # Le client doit revalider à chaque fois : l'ETag rend la revalidation peu coûteuse.
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
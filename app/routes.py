@@ -1,22 +1,100 @@
-from flask import render_template, request, redirect, url_for, jsonify
+from flask import Blueprint, Response, render_template, request, redirect, url_for, jsonify, g, abort, send_file, send_from_directory
+from flask_socketio import join_room
+from werkzeug.local import LocalProxy
+from werkzeug.utils import safe_join
 import os
+import re
 import random
 
-from app import app
-from app import models, utils
+from app import app, socketio
+from app import models, utils, render_cache, metrics, profiling, compression
 from app.models import Participant
-from app.portrait_utils import get_portraits_and_folders
+from app.portrait_utils import (PortraitIndex, paginate, get_portrait_variant, source_digest,
+                                PORTRAIT_VARIANTS, PORTRAITS_PER_PAGE)
+from app.assets import IMMUTABLE_MAX_AGE, manifest, portrait_url, icon_atlas
+from app.render_cache import render_cached
 
 # --- Constantes ---
 
 # Le chemin vers le dossier des portraits, situé dans le dossier 'static'.
 PORTRAIT_DIR = os.path.join(app.static_folder, 'portraits')
 os.makedirs(PORTRAIT_DIR, exist_ok=True) # S'assure que le dossier existe.
+# Le cache des variantes redimensionnées des portraits (miniatures, taille d'affichage).
+PORTRAIT_CACHE_DIR = os.path.join(utils.DATA_DIR, 'portrait_cache')
+# L'index en mémoire de l'arborescence des portraits, pour l'explorateur et la recherche.
+portrait_index = PortraitIndex(PORTRAIT_DIR)
+
+
+# --- Tables de jeu ---
+
+# Toutes les routes liées à un combat sont regroupées dans ce blueprint, enregistré deux fois
+# (voir la fin du fichier) : à la racine pour la table par défaut, et sous '/t/<table_id>/'
+# pour les autres tables hébergées par le même serveur.
+tracker = Blueprint('tracker', __name__)
+
+# L'état de la table de la requête en cours (voir 'models.Tracker').
+table = LocalProxy(lambda: g.table)
+
+@tracker.url_value_preprocessor
+def pull_table(endpoint, values):
+    """
+    Sélectionne la table visée par l'URL (la table par défaut sans préfixe).
+    Les requêtes POST modifient la table : elles l'ouvrent en écriture (voir 'models.open_table').
+    """
+    table_id = values.pop('table_id', models.DEFAULT_TABLE_ID) if values else models.DEFAULT_TABLE_ID
+    if not models.is_valid_table_id(table_id):
+        abort(404)
+    g.table = models.open_table(table_id, write=(request.method == 'POST'))
+
+@tracker.url_defaults
+def add_table(endpoint, values):
+    """Ajoute automatiquement l'identifiant de la table courante aux URL générées par 'url_for'."""
+    if 'table_id' not in values and 'table' in g and app.url_map.is_endpoint_expecting(endpoint, 'table_id'):
+        values['table_id'] = g.table.id
+
+@tracker.context_processor
+def inject_table():
+    """
+    Rend disponibles dans les templates l'identifiant de la table, la base de ses URL
+    ('' pour la table par défaut, '/t/<table_id>' sinon), utilisée par le JavaScript,
+    et l'atlas des icônes de statut.
+    """
+    return {'table_id': table.id, 'table_base': url_for('.index').rstrip('/'),
+            'icon_atlas': icon_atlas(models.STATUS_EFFECTS)}
+
+# Vue ('gm', 'player', 'portrait') de chaque client Socket.IO inscrit à une table, par identifiant de session.
+_client_views = {}
+CLIENT_VIEWS = ('gm', 'player', 'portrait')
+
+@socketio.on('join_table')
+@profiling.sampled('socketio:join_table')
+def join_table(data):
+    """
+    Inscrit le client Socket.IO dans la salle de sa table : il ne reçoit que les deltas de cette table.
+    """
+    data = data or {}
+    table_id = data.get('table', models.DEFAULT_TABLE_ID)
+    if models.is_valid_table_id(table_id):
+        join_room(models.table_room(table_id))
+        view = data.get('view') if data.get('view') in CLIENT_VIEWS else 'other'
+        previous = _client_views.get(request.sid)
+        if previous is not None:
+            metrics.SOCKET_CLIENTS.dec(previous)
+        _client_views[request.sid] = view
+        metrics.SOCKET_CLIENTS.inc(view)
+
+@socketio.on('disconnect')
+@profiling.sampled('socketio:disconnect')
+def leave_table(*args):
+    """Retire le client déconnecté des mesures des clients connectés."""
+    view = _client_views.pop(request.sid, None)
+    if view is not None:
+        metrics.SOCKET_CLIENTS.dec(view)
 
 
 # --- Routes principales pour l'affichage des pages ---
 
-@app.route('/')
+@tracker.route('/')
 def index():
     """
     Affiche la page principale de l'application (la vue du Maître de Jeu).
@@ -24,31 +102,31 @@ def index():
     """
     encounters_list = utils.list_encounters()
     return render_template('index.html', 
-                             participants=models.initiative_data, 
-                             current_turn_index=models.current_turn_index,
+                             participants=table.initiative_data, 
+                             current_turn_index=table.current_turn_index,
                              encounters=encounters_list,
                              all_statuses=models.STATUS_EFFECTS)
 
-@app.route('/view')
+@tracker.route('/view')
 def view():
     """
     Affiche la page de vue pour les joueurs, qui ne montre que l'ordre d'initiative
     et les informations publiques des participants.
     """
     return render_template('view.html', 
-                           participants=models.initiative_data, 
-                           current_turn_index=models.current_turn_index, 
+                           participants=table.initiative_data, 
+                           current_turn_index=table.current_turn_index, 
                            all_statuses=models.STATUS_EFFECTS)
 
-@app.route('/portrait_view')
+@tracker.route('/portrait_view')
 def portrait_view():
     """
     Affiche une vue centrée sur le portrait du participant dont c'est le tour.
     Utile pour un affichage sur un écran secondaire.
     """
     active_participant = None
-    if models.initiative_data and 0 <= models.current_turn_index < len(models.initiative_data):
-        active_participant = models.initiative_data[models.current_turn_index]
+    if table.initiative_data and 0 <= table.current_turn_index < len(table.initiative_data):
+        active_participant = table.initiative_data[table.current_turn_index]
     return render_template('portrait_view.html', participant=active_participant)
 
 @app.route('/select_portrait')
@@ -63,25 +141,14 @@ def select_portrait():
 
 # --- Routes pour la gestion des participants ---
 
-@app.route('/add', methods=['POST'])
+@tracker.route('/add', methods=['POST'])
 def add():
     """
     Ajoute un nouveau participant (joueur, monstre ou allié) à la liste d'initiative.
     Les données sont reçues via une requête POST depuis un formulaire.
     """
     name = request.form.get('name')
-    is_player_val = request.form.get('is_player')
-    portrait_filename = request.form.get('portrait')
-
-    if portrait_filename == "":
-        portrait_filename = None
-
-    if is_player_val == 'player':
-        role = 'player'
-        p_type = 'Joker' # Les joueurs sont toujours de type 'Joker'
-    else:
-        role = is_player_val
-        p_type = request.form.get('type', 'Extra')
+    role, p_type, portrait_filename = _participant_template(request.form)
 
     if name:
         new_participant = Participant(
@@ -93,145 +160,402 @@ def add():
             initiative_roll=random.randint(1, 20) if role != 'player' else 10,
             portrait=portrait_filename
         )
-        models.initiative_data.append(new_participant)
-        models.sort_participants() # Trie la liste après l'ajout.
+        table.add_participants([new_participant]) # Insère le participant à sa place dans l'ordre.
+        table.update_state(changed=[new_participant])
 
     return jsonify({'success': True})
 
-@app.route('/participant/<int:p_index>/edit', methods=['POST'])
-def edit_participant(p_index):
+def _participant_template(form):
     """
-    Modifie les informations d'un participant existant (nom, initiative, rôle, etc.).
+    Lit dans le formulaire d'ajout le rôle, le type de personnage et le portrait d'un nouveau participant.
+
+    Returns:
+        tuple: (role, p_type, portrait), le portrait valant None s'il n'est pas renseigné.
     """
-    if 0 <= p_index < len(models.initiative_data):
-        participant = models.initiative_data[p_index]
-        
-        participant.name = request.form.get('name', participant.name)
-        try:
-            new_initiative = request.form.get('initiative_roll')
-            if new_initiative is not None and str(new_initiative).strip():
-                participant.initiative_roll = int(new_initiative)
-        except (ValueError, TypeError):
-            pass # Ignore les valeurs d'initiative non valides.
-        
-        participant.role = request.form.get('role', participant.role)
-        participant.p_type = request.form.get('p_type', participant.p_type)
-        
-        portrait = request.form.get('portrait')
-        if portrait == '':
-            participant.portrait = None
-        elif portrait is not None:
-            participant.portrait = portrait
-        
-        participant.is_player = (participant.role == 'player')
-
-        models.sort_participants()
-        return jsonify({'success': True})
+    is_player_val = form.get('is_player')
+    portrait_filename = form.get('portrait') or None
+    if is_player_val == 'player':
+        return 'player', 'Joker', portrait_filename # Les joueurs sont toujours de type 'Joker'
+    return is_player_val, form.get('type', 'Extra'), portrait_filename
+
+# Nombre maximal de participants créés par un appel à '/spawn'.
+MAX_SPAWN_COUNT = 1000
+
+def _spawn_names(pattern, count):
+    """
+    Génère 'count' noms numérotés à partir de 'pattern' ('Gobelin' -> 'Gobelin 1', 'Gobelin 2'...).
+    Le numéro remplace '{n}' s'il est présent dans 'pattern', et est ajouté à la fin sinon.
+    La numérotation reprend après le plus grand numéro déjà présent dans la table.
+    """
+    if '{n}' not in pattern:
+        pattern += ' {n}'
+    prefix, suffix = pattern.split('{n}', 1)
+    existing = re.compile(re.escape(prefix) + r'(\d+)' + re.escape(suffix) + '$')
+    start = 0
+    for p in table.initiative_data:
+        match = existing.match(p.name)
+        if match:
+            start = max(start, int(match.group(1)))
+    return [f"{prefix}{number}{suffix}" for number in range(start + 1, start + count + 1)]
+
+@tracker.route('/spawn', methods=['POST'])
+def spawn():
+    """
+    Ajoute un groupe de participants identiques (une horde de sbires) en une seule fois.
+    Les champs sont ceux du formulaire d'ajout ('name', 'is_player', 'type', 'portrait'),
+    plus le nombre de participants ('count'). Le nom sert de modèle (voir '_spawn_names()').
+
+    Les initiatives et les identifiants sont tirés en un seul appel, les participants fusionnés dans l'ordre
+    d'initiative en un seul passage, et un seul delta est diffusé.
+    """
+    name = request.form.get('name', '').strip()
+    count = request.form.get('count', type=int)
+    if not name or count is None or not 1 <= count <= MAX_SPAWN_COUNT:
+        return jsonify({'success': False, 'message': f"A name and a count between 1 and {MAX_SPAWN_COUNT} are required."}), 400
+    role, p_type, portrait_filename = _participant_template(request.form)
+
+    is_player = (role == 'player')
+    rolls = [10] * count if is_player else random.choices(range(1, 21), k=count)
+    spawned = [Participant(name=spawned_name, role=role, p_type=p_type, is_player=is_player,
+                           initiative_roll=roll, is_critical=(roll == 20 and not is_player),
+                           portrait=portrait_filename, id=participant_id)
+               for spawned_name, roll, participant_id
+               in zip(_spawn_names(name, count), rolls, models.new_participant_ids(count))]
+    table.add_participants(spawned)
+    table.update_state(changed=spawned)
+    return jsonify({'success': True, 'ids': [p.id for p in spawned]})
+
+def _participant_not_found():
+    """Réponse d'erreur commune lorsqu'un participant est introuvable."""
     return jsonify({'success': False, 'message': 'Participant not found'}), 404
 
-@app.route('/remove/<int:index>', methods=['POST'])
-def remove_participant(index):
+@tracker.route('/participants/<participant_id>/edit', methods=['POST'])
+def participant_edit(participant_id):
+    """
+    Modifie les informations d'un participant existant (nom, initiative, rôle, etc.).
+    """
+    participant = table.get_participant(participant_id)
+    if participant is None:
+        return _participant_not_found()
+
+    participant.name = request.form.get('name', participant.name)
+    try:
+        new_initiative = request.form.get('initiative_roll')
+        if new_initiative is not None and str(new_initiative).strip():
+            participant.initiative_roll = int(new_initiative)
+    except (ValueError, TypeError):
+        pass # Ignore les valeurs d'initiative non valides.
+    
+    participant.role = request.form.get('role', participant.role)
+    participant.p_type = request.form.get('p_type', participant.p_type)
+    
+    portrait = request.form.get('portrait')
+    if portrait == '':
+        participant.portrait = None
+    elif portrait is not None:
+        participant.portrait = portrait
+    
+    participant.is_player = (participant.role == 'player')
+
+    table.reposition_participants([participant])
+    table.update_state(changed=[participant])
+    return jsonify({'success': True})
+
+@tracker.route('/participants/<participant_id>/remove', methods=['POST'])
+def participant_remove(participant_id):
     """Supprime un participant de la liste d'initiative."""
-    if 0 <= index < len(models.initiative_data):
-        models.initiative_data.pop(index)
-
-        # Ajuste l'index du tour courant si nécessaire pour éviter les erreurs.
-        if models.current_turn_index >= len(models.initiative_data) and len(models.initiative_data) > 0:
-            models.current_turn_index = len(models.initiative_data) - 1
-        elif index < models.current_turn_index:
-            models.current_turn_index -= 1
-        models.update_state()
-            
+    participant = table.get_participant(participant_id)
+    if participant is None:
+        return _participant_not_found()
+    table.remove_participant(participant)
+    table.update_state(removed=[participant])
     return jsonify({'success': True})
 
 
 # --- Routes pour la gestion des blessures et statuts ---
 
-@app.route('/add_wound/<int:index>', methods=['POST'])
-def add_wound(index):
+@tracker.route('/participants/<participant_id>/add_wound', methods=['POST'])
+def participant_add_wound(participant_id):
     """Ajoute une blessure à un participant."""
-    if 0 <= index < len(models.initiative_data):
-        participant = models.initiative_data[index]
-        participant.add_wound()
-        models.update_state()
+    participant = table.get_participant(participant_id)
+    if participant is None:
+        return _participant_not_found()
+    participant.add_wound()
+    table.update_state(changed=[participant])
     return jsonify({'success': True})
 
-@app.route('/remove_wound/<int:index>', methods=['POST'])
-def remove_wound(index):
+@tracker.route('/participants/<participant_id>/remove_wound', methods=['POST'])
+def participant_remove_wound(participant_id):
     """Retire une blessure à un participant."""
-    if 0 <= index < len(models.initiative_data):
-        participant = models.initiative_data[index]
-        participant.remove_wound()
-        models.update_state()
+    participant = table.get_participant(participant_id)
+    if participant is None:
+        return _participant_not_found()
+    participant.remove_wound()
+    table.update_state(changed=[participant])
     return jsonify({'success': True})
 
-@app.route('/participant/<int:p_index>/status/add', methods=['POST'])
-def add_status(p_index):
+@tracker.route('/participants/<participant_id>/status/add', methods=['POST'])
+def participant_add_status(participant_id):
     """Ajoute un statut (ex: Secoué, Entravé) à un participant."""
-    if 0 <= p_index < len(models.initiative_data):
-        participant = models.initiative_data[p_index]
-        status_name = request.form.get('status')
-        duration_str = request.form.get('duration')
-
-        # Ajoute le statut seulement s'il n'est pas déjà présent.
-        if status_name in models.STATUS_EFFECTS and not any(s['name'] == status_name for s in participant.statuses):
-            new_status = {'name': status_name, 'duration': None}
-            if duration_str and duration_str.isdigit():
-                duration = int(duration_str)
-                if duration > 0:
-                    new_status['duration'] = duration
-            
-            participant.statuses.append(new_status)
-            models.update_state()
+    participant = table.get_participant(participant_id)
+    if participant is None:
+        return _participant_not_found()
+    status_name = request.form.get('status')
+    duration_str = request.form.get('duration')
+    duration = int(duration_str) if duration_str and duration_str.isdigit() else None
+    if status_name in models.STATUS_EFFECTS and participant.add_status(status_name, duration):
+        table.update_state(changed=[participant])
     return jsonify({'success': True})
 
-@app.route('/participant/<int:p_index>/status/remove', methods=['POST'])
-def remove_status(p_index):
+@tracker.route('/participants/<participant_id>/status/remove', methods=['POST'])
+def participant_remove_status(participant_id):
     """Supprime un statut d'un participant."""
-    if 0 <= p_index < len(models.initiative_data):
-        participant = models.initiative_data[p_index]
-        status_to_remove = request.form.get('status')
-        participant.statuses = [s for s in participant.statuses if s['name'] != status_to_remove]
-        models.update_state()
+    participant = table.get_participant(participant_id)
+    if participant is None:
+        return _participant_not_found()
+    status_to_remove = request.form.get('status')
+    participant.remove_statuses(status_to_remove)
+    table.update_state(changed=[participant])
     return jsonify({'success': True})
 
 
+# --- Routes de compatibilité adressant les participants par leur position ---
+# La position d'un participant change à chaque tri : ces routes sont conservées pour les
+# anciens clients, mais les routes par identifiant ci-dessus doivent être préférées.
+
+def _at_position(index, view):
+    """
+    Appelle la route par identifiant 'view' pour le participant à la position 'index'.
+    Comme auparavant, une position invalide est ignorée silencieusement.
+    """
+    participant = table.get_participant_at(index)
+    if participant is None:
+        return jsonify({'success': True})
+    return view(participant.id)
+
+@tracker.route('/participant/<int:p_index>/edit', methods=['POST'])
+def edit_participant(p_index):
+    """Compatibilité : modifie le participant à la position 'p_index'."""
+    participant = table.get_participant_at(p_index)
+    if participant is None:
+        return _participant_not_found()
+    return participant_edit(participant.id)
+
+@tracker.route('/remove/<int:index>', methods=['POST'])
+def remove_participant(index):
+    """Compatibilité : supprime le participant à la position 'index'."""
+    return _at_position(index, participant_remove)
+
+@tracker.route('/add_wound/<int:index>', methods=['POST'])
+def add_wound(index):
+    """Compatibilité : ajoute une blessure au participant à la position 'index'."""
+    return _at_position(index, participant_add_wound)
+
+@tracker.route('/remove_wound/<int:index>', methods=['POST'])
+def remove_wound(index):
+    """Compatibilité : retire une blessure au participant à la position 'index'."""
+    return _at_position(index, participant_remove_wound)
+
+@tracker.route('/participant/<int:p_index>/status/add', methods=['POST'])
+def add_status(p_index):
+    """Compatibilité : ajoute un statut au participant à la position 'p_index'."""
+    return _at_position(p_index, participant_add_status)
+
+@tracker.route('/participant/<int:p_index>/status/remove', methods=['POST'])
+def remove_status(p_index):
+    """Compatibilité : supprime un statut du participant à la position 'p_index'."""
+    return _at_position(p_index, participant_remove_status)
+
+
+# --- Modifications groupées ---
+# Une action qui touche plusieurs participants (effet de zone, attaque multiple) est envoyée
+# en une seule requête à '/api/batch' : les opérations sont appliquées ensemble, sur une seule
+# révision de l'état, avec au plus un replacement dans l'ordre d'initiative et un seul delta diffusé.
+
+# Nombre maximal d'opérations acceptées par requête.
+MAX_BATCH_OPERATIONS = 1000
+
+def _batch_wound(participant, operation):
+    before = (participant.wounds, participant.statuses)
+    participant.add_wound()
+    return (participant.wounds, participant.statuses) != before
+
+def _batch_heal(participant, operation):
+    before = (participant.wounds, participant.statuses)
+    participant.remove_wound()
+    return (participant.wounds, participant.statuses) != before
+
+def _batch_add_status(participant, operation):
+    return participant.add_status(operation['status'], operation.get('duration'))
+
+def _batch_remove_status(participant, operation):
+    return participant.remove_statuses(operation['status'])
+
+def _batch_set_initiative(participant, operation):
+    changed = participant.initiative_roll != operation['initiative']
+    participant.initiative_roll = operation['initiative']
+    return changed
+
+# Opérations acceptées par '/api/batch' : nom -> fonction qui l'applique à un participant
+# et indique si le participant a changé. 'remove' est traitée à part.
+BATCH_OPERATIONS = {
+    'wound': _batch_wound,
+    'heal': _batch_heal,
+    'add_status': _batch_add_status,
+    'remove_status': _batch_remove_status,
+    'set_initiative': _batch_set_initiative,
+    'remove': None,
+}
+
+def _check_batch_operation(operation, removed_ids):
+    """
+    Vérifie une opération de '/api/batch' avant de l'appliquer.
+    'removed_ids' contient les participants retirés par les opérations précédentes du lot.
+
+    Returns:
+        str: Le message d'erreur, ou None si l'opération est valide.
+    """
+    if not isinstance(operation, dict) or operation.get('op') not in BATCH_OPERATIONS:
+        return 'Unknown operation'
+    participant_id = operation.get('id')
+    if not isinstance(participant_id, str) or table.get_participant(participant_id) is None \
+            or participant_id in removed_ids:
+        return 'Participant not found'
+    op = operation['op']
+    if op == 'add_status' and operation.get('status') not in models.STATUS_EFFECTS:
+        return 'Unknown status'
+    if op == 'add_status' and (not isinstance(operation.get('duration', 0) or 0, int)
+                               or isinstance(operation.get('duration'), bool)):
+        return 'Invalid duration'
+    if op == 'remove_status' and not isinstance(operation.get('status'), str):
+        return 'Missing status'
+    if op == 'set_initiative' and (not isinstance(operation.get('initiative'), int)
+                                   or isinstance(operation['initiative'], bool)):
+        return 'Invalid initiative'
+    if op == 'remove':
+        removed_ids.add(participant_id)
+    return None
+
+@tracker.route('/api/batch', methods=['POST'])
+def api_batch():
+    """
+    Applique une liste d'opérations sur les participants, en une seule modification de l'état.
+
+    Corps JSON : {"operations": [{"op": ..., "id": ..., ...}, ...], "rev": ...}
+    - 'wound', 'heal' : ajoute ou retire une blessure ;
+    - 'add_status' ('status', 'duration' optionnelle), 'remove_status' ('status') ;
+    - 'set_initiative' ('initiative') ;
+    - 'remove' : retire le participant.
+    'rev' (optionnel) est la révision de l'état sur laquelle les opérations ont été préparées :
+    si l'état a changé depuis, rien n'est appliqué (code 409).
+
+    Les opérations sont toutes vérifiées avant d'être appliquées : si l'une d'elles est invalide,
+    aucune n'est appliquée (code 400). Le résultat de chaque opération est retourné dans 'results',
+    dans l'ordre de la requête, avec 'changed' à False si elle n'a rien modifié.
+    """
+    data = request.get_json(silent=True)
+    operations = data.get('operations') if isinstance(data, dict) else None
+    if not isinstance(operations, list):
+        return jsonify({'success': False, 'message': 'Missing operations'}), 400
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        return jsonify({'success': False, 'message': f"Too many operations (max {MAX_BATCH_OPERATIONS})"}), 400
+    if data.get('rev') is not None and data['rev'] != table.state_revision:
+        return jsonify({'success': False, 'message': 'State has changed', 'rev': table.state_revision}), 409
+
+    removed_ids = set()
+    errors = [_check_batch_operation(operation, removed_ids) for operation in operations]
+    if any(errors):
+        results = [{'success': False, 'message': error} if error else {'success': True, 'changed': False}
+                   for error in errors]
+        return jsonify({'success': False, 'message': 'Invalid operations', 'results': results}), 400
+
+    results = []
+    changed = {}
+    removed = {}
+    initiative_changed = {}
+    for operation in operations:
+        participant = table.get_participant(operation['id'])
+        if operation['op'] == 'remove':
+            removed[participant.id] = participant
+            results.append({'success': True, 'changed': True})
+            continue
+        was_changed = BATCH_OPERATIONS[operation['op']](participant, operation)
+        if was_changed:
+            changed[participant.id] = participant
+            if operation['op'] == 'set_initiative':
+                initiative_changed[participant.id] = participant
+        results.append({'success': True, 'changed': was_changed})
+
+    if changed or removed:
+        table.remove_participants(list(removed.values()))
+        table.reposition_participants([p for pid, p in initiative_changed.items() if pid not in removed])
+        table.update_state(changed=[p for pid, p in changed.items() if pid not in removed],
+                           removed=list(removed.values()))
+    return jsonify({'success': True, 'rev': table.state_revision, 'results': results})
+
+
 # --- Routes pour le déroulement du combat ---
 
-@app.route('/update_initiatives', methods=['POST'])
+@tracker.route('/update_initiatives', methods=['POST'])
 def update_initiatives():
-    """Met à jour en masse les jets d'initiative de tous les participants."""
+    """
+    Met à jour en masse les jets d'initiative des participants.
+    Les champs 'id_<identifiant>' désignent un participant par son identifiant ;
+    les anciens champs 'p_<position>' sont encore acceptés pour compatibilité.
+    """
+    updates = []
     for key, value in request.form.items():
-        if key.startswith('p_'):
-            try:
-                index = int(key.split('_')[1])
-                initiative_roll = int(value)
-                if 0 <= index < len(models.initiative_data):
-                    participant = models.initiative_data[index]
-                    participant.initiative_roll = initiative_roll
-            except (ValueError, IndexError):
-                pass
-    models.sort_participants()
+        try:
+            if key.startswith('id_'):
+                participant = table.get_participant(key[len('id_'):])
+            elif key.startswith('p_'):
+                participant = table.get_participant_at(int(key.split('_')[1]))
+            else:
+                continue
+            if participant is not None:
+                updates.append((participant, int(value)))
+        except (ValueError, IndexError):
+            pass
+
+    changed = []
+    for participant, initiative_roll in updates:
+        if participant.initiative_roll != initiative_roll:
+            participant.initiative_roll = initiative_roll
+            changed.append(participant)
+    table.reposition_participants(changed)
+    table.update_state(changed=changed)
     return jsonify({'success': True})
 
-@app.route('/next', methods=['POST'])
+@tracker.route('/next', methods=['POST'])
 def next_turn():
-    """Passe au tour du prochain participant valide (pas 'Mort')."""
-    if not models.initiative_data:
+    """Passe au tour du prochain participant valide (pas 'Mort', pas en attente)."""
+    if not table.initiative_data:
         return jsonify({'success': False, 'message': 'No participants.'})
-
-    # Cherche le prochain participant valide en boucle.
-    for i in range(len(models.initiative_data)):
-        next_index = (models.current_turn_index + 1 + i) % len(models.initiative_data)
-        p = models.initiative_data[next_index]
-        if p.status['class'] != 'status-dead':
-            models.current_turn_index = next_index
-            models.update_state()
-            return jsonify({'success': True})
-    
+    if table.next_turn():
+        return jsonify({'success': True})
     return jsonify({'success': False, 'message': 'No valid next turn.'})
 
-@app.route('/new_round', methods=['POST'])
+@tracker.route('/participants/<participant_id>/hold', methods=['POST'])
+def participant_hold(participant_id):
+    """Met un participant en attente (action retenue) ; si c'était son tour, le tour passe au suivant."""
+    participant = table.get_participant(participant_id)
+    if participant is None:
+        return _participant_not_found()
+    if not table.hold_turn(participant):
+        return jsonify({'success': False, 'message': 'Participant cannot hold its action.'}), 400
+    return jsonify({'success': True})
+
+@tracker.route('/participants/<participant_id>/act', methods=['POST'])
+def participant_act(participant_id):
+    """Fait agir immédiatement un participant en attente ; le participant interrompu reprend ensuite son tour."""
+    participant = table.get_participant(participant_id)
+    if participant is None:
+        return _participant_not_found()
+    if not table.act_now(participant):
+        return jsonify({'success': False, 'message': 'Participant is not on hold.'}), 400
+    return jsonify({'success': True})
+
+@tracker.route('/new_round', methods=['POST'])
 def new_round():
     """
     Démarre un nouveau round de combat.
@@ -239,128 +563,288 @@ def new_round():
     - Relance l'initiative pour tous les PNJ.
     - Réinitialise le tour au premier participant.
     """
-    models.current_turn_index = 0
-    for p in models.initiative_data:
-        if p.status['class'] in ['status-dead', 'status-out']:
-            continue
+    table.new_round()
+    return jsonify({'success': True})
 
-        # Décrémente la durée des statuts avec une durée définie.
-        active_statuses = []
-        for status in p.statuses:
-            if isinstance(status, dict) and status.get('duration') is not None:
-                status['duration'] -= 1
-                if status['duration'] > 0:
-                    active_statuses.append(status)
-            else:
-                active_statuses.append(status) # Conserve les statuts sans durée.
-        p.statuses = active_statuses
-
-        # Relance l'initiative pour les PNJ.
-        if not p.is_player:
-            roll = random.randint(1, 20)
-            p.initiative_roll = roll
-            p.is_critical = (roll == 20)
-        
-    models.sort_participants()
-    
-    # Trouve le premier participant valide pour commencer le round.
-    models.current_turn_index = -1
-    if models.initiative_data:
-        for i, p_data in enumerate(models.initiative_data):
-            if p_data.status['class'] not in ['status-dead', 'status-out']:
-                models.current_turn_index = i
-                break
-    models.update_state()
-    
+@tracker.route('/undo', methods=['POST'])
+def undo():
+    """Annule la dernière mutation de la table (blessure, suppression, tour...)."""
+    if not table.undo():
+        return jsonify({'success': False, 'message': 'Nothing to undo'}), 400
     return jsonify({'success': True})
 
-@app.route('/reset_combat', methods=['POST'])
+@tracker.route('/redo', methods=['POST'])
+def redo():
+    """Rétablit la dernière mutation annulée."""
+    if not table.redo():
+        return jsonify({'success': False, 'message': 'Nothing to redo'}), 400
+    return jsonify({'success': True})
+
+@tracker.route('/reset_combat', methods=['POST'])
 def reset_combat():
     """Réinitialise le combat, ne conservant que les joueurs."""
-    models.initiative_data = [p for p in models.initiative_data if p.role == 'player']
-    models.current_turn_index = 0
-    models.update_state()
+    _, removed = table.set_participants([p for p in table.initiative_data if p.role == 'player'])
+    table.current_turn_index = 0
+    table.update_state(removed=removed)
     return jsonify({'success': True})
 
-@app.route('/reset', methods=['POST'])
+@tracker.route('/reset', methods=['POST'])
 def reset():
     """Réinitialise complètement l'application, supprimant tous les participants."""
-    models.initiative_data = []
-    models.current_turn_index = 0
-    models.update_state()
+    _, removed = table.set_participants([])
+    table.current_turn_index = 0
+    table.update_state(removed=removed)
     return jsonify({'success': True})
 
 
 # --- Routes pour la sauvegarde et le chargement de données ---
 
-@app.route('/save_players', methods=['POST'])
+@tracker.route('/save_players', methods=['POST'])
 def save_players_route():
-    """Sauvegarde les données des joueurs actuels dans un fichier JSON."""
-    utils.save_players(models.initiative_data)
+    """Sauvegarde les données des joueurs actuels dans le fichier des joueurs."""
+    utils.save_players(table.initiative_data)
     return jsonify({'success': True})
 
-@app.route('/load_players', methods=['POST'])
+@tracker.route('/load_players', methods=['POST'])
 def load_players_route():
-    """Charge les données des joueurs depuis un fichier JSON."""
-    models.initiative_data, _ = utils.load_players(models.initiative_data)
-    models.sort_participants()
+    """Charge les données des joueurs depuis le fichier des joueurs."""
+    participants, _ = utils.load_players(table.initiative_data)
+    loaded, removed = table.set_participants(participants)
+    table.update_state(changed=loaded, removed=removed)
     return jsonify({'success': True})
 
-@app.route('/save_encounter', methods=['POST'])
+@tracker.route('/save_encounter', methods=['POST'])
 def save_encounter_route():
     """Sauvegarde la configuration actuelle des PNJ en tant que rencontre."""
     name = request.form.get('encounter_name')
     if name:
-        utils.save_encounter(name, models.initiative_data)
+        utils.save_encounter(name, table.initiative_data)
     return jsonify({'success': True})
 
-@app.route('/load_encounter/<filename>', methods=['POST'])
+@tracker.route('/load_encounter/<filename>', methods=['POST'])
 def load_encounter_route(filename):
-    """Charge une rencontre de PNJ depuis un fichier JSON."""
+    """Charge une rencontre de PNJ depuis son fichier de sauvegarde."""
     file_path = os.path.join(utils.ENCOUNTERS_DIR, filename)
-    models.initiative_data, _ = utils.load_encounter(file_path, models.initiative_data)
-    models.sort_participants()
+    participants, _ = utils.load_encounter(file_path, list(table.initiative_data))
+    loaded, _ = table.set_participants(participants)
+    table.update_state(changed=loaded)
     return jsonify({'success': True})
 
 
 # --- API interne pour le rafraîchissement dynamique de l'interface ---
 
-@app.route('/api/participants')
+@tracker.route('/api/participants')
 def api_participants_list():
     """API pour obtenir la liste complète des participants en format JSON."""
-    return jsonify([p.to_dict() for p in models.initiative_data])
+    return jsonify([p.to_dict() for p in table.initiative_data])
+
+@tracker.route('/api/participants/<participant_id>')
+def api_participant(participant_id):
+    """API pour obtenir un participant par son identifiant, en format JSON."""
+    participant = table.get_participant(participant_id)
+    if participant is None:
+        return _participant_not_found()
+    return jsonify(models.participant_payload(participant))
+
+@tracker.route('/api/state')
+def api_state():
+    """
+    API de synchronisation de l'état.
+    Avec le paramètre 'since', retourne les deltas émis depuis cette révision s'ils sont
+    encore dans l'historique ; sinon (ou sans paramètre), retourne un instantané complet.
+    """
+    since = request.args.get('since', type=int)
+    if since is not None:
+        deltas = table.deltas_since(since)
+        if deltas is not None:
+            return jsonify({'rev': table.state_revision, 'deltas': deltas})
+    # Les deltas dépendent aussi de ce qui a déjà été diffusé ; l'instantané, de la seule révision.
+    compression.cache_per_revision()
+    return jsonify({'rev': table.state_revision, 'snapshot': table.state_snapshot()})
+
+@tracker.route('/api/stats')
+def api_stats():
+    """
+    API qui retourne les compteurs internes : diffusions (changements signalés, deltas émis,
+    émissions évitées), cache des vues partielles (rendus, réponses depuis le cache, 304)
+    et compression des réponses (réponses compressées, octets avant et après compression).
+    """
+    return jsonify({
+        'broadcast': table.get_broadcast_stats(),
+        'render_cache': render_cache.stats,
+        'compression': compression.stats,
+    })
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """
+    Mesures du serveur au format texte de Prometheus : requêtes et leur durée par route, durée
+    des rendus par vue partielle, diffusions et destinataires, clients Socket.IO connectés par vue,
+    participants par table et durée des entrées/sorties de persistance (voir 'app.metrics').
+    """
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/admin/profile', methods=['GET', 'POST'])
+def admin_profile():
+    """
+    Pilote le profilage par échantillonnage (voir 'app.profiling').
+
+    GET retourne l'état du profilage et, par route, le nombre de traitements suivis et de piles
+    relevées. POST change les réglages : 'rate' (fraction des requêtes suivies, 0 pour arrêter),
+    'interval' (secondes entre deux relevés) et 'reset' (oublie les piles déjà relevées).
+    La route n'étant pas authentifiée, POST est refusé (code 403) sauf si la configuration
+    l'autorise ('PROFILE_ADMIN').
+    """
+    if request.method == 'POST':
+        if not app.config['PROFILE_ADMIN']:
+            return jsonify({'success': False, 'message': 'Profiling control is disabled (set WEBTRACKER_PROFILE_ADMIN=1).'}), 403
+        data = request.get_json(silent=True) or request.form
+        try:
+            profiling.configure(data.get('rate'), data.get('interval'))
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        if data.get('reset') not in (None, False, '', '0', 'false'):
+            profiling.reset()
+        return jsonify({'success': True, 'profile': profiling.summary()})
+    return jsonify(profiling.summary())
+
+@app.route('/admin/profile/stacks')
+def admin_profile_stacks():
+    """
+    Piles relevées par le profilage, au format des piles repliées (flamegraph.pl, speedscope...).
+    Le paramètre 'route' limite la réponse aux piles d'une route ('add', 'api_main_content',
+    'socketio:join_table', '(hors requête)'...).
+    """
+    return Response(profiling.collapsed(request.args.get('route')), mimetype='text/plain; charset=utf-8')
 
 @app.route('/api/portraits')
 def api_portraits():
-    """API pour l'explorateur de fichiers de portraits."""
+    """
+    API pour l'explorateur de fichiers de portraits.
+
+    Paramètres :
+    - 'path' : le dossier à lister (la racine par défaut) ;
+    - 'q' : si présent, cherche dans tous les dossiers au lieu de lister 'path' ;
+      les images retournées sont alors des chemins relatifs à la racine ;
+    - 'page' et 'per_page' : pagination des images (toujours appliquée à une recherche).
+    """
     rel_path = request.args.get('path', '')
     
     # Sécurité : empêche de remonter dans l'arborescence des fichiers.
     if '..' in rel_path or os.path.isabs(rel_path):
         return jsonify({'error': 'Chemin invalide'}), 400
-    
-    portraits_data = get_portraits_and_folders(PORTRAIT_DIR, rel_path)
+
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', PORTRAITS_PER_PAGE, type=int)
+    query = request.args.get('q')
+    if query is not None:
+        results = portrait_index.search(query, page, per_page)
+        portraits_data = {'folders': [], 'images': results.pop('items'), **results}
+        image_paths = portraits_data['images']
+    else:
+        portraits_data = portrait_index.listing(rel_path)
+        if 'page' in request.args or 'per_page' in request.args:
+            results = paginate(portraits_data['images'], page, per_page)
+            portraits_data['images'] = results.pop('items')
+            portraits_data.update(results)
+        base = rel_path.strip('/')
+        image_paths = [f"{base}/{image}" if base else image for image in portraits_data['images']]
+
+    # URL de la miniature de chaque image, pour la grille de sélection.
+    portraits_data['thumbnails'] = {
+        image: portrait_url(path, 'thumb') for image, path in zip(portraits_data['images'], image_paths)
+    }
     return jsonify(portraits_data)
 
-@app.route('/api/view_content')
+def _cache_forever(response):
+    """Marque une réponse servie sous une URL avec empreinte comme cachable sans revalidation."""
+    response.cache_control.no_cache = None
+    response.cache_control.public = True
+    response.cache_control.max_age = IMMUTABLE_MAX_AGE
+    response.cache_control.immutable = True
+    return response
+
+@app.route('/portraits/<fingerprint>/<variant>/<path:filename>')
+def portrait_variant(fingerprint, variant, filename):
+    """
+    Sert une variante redimensionnée d'un portrait : 'thumb' (grille de sélection)
+    ou 'display' (vue portrait). La variante est générée à la première demande.
+
+    'fingerprint' est l'empreinte du portrait original (voir 'assets.portrait_url()') : si elle
+    correspond au fichier actuel, la réponse est mise en cache sans revalidation. Sinon (portrait
+    remplacé depuis), la variante actuelle est servie avec une revalidation à chaque affichage.
+    """
+    if variant not in PORTRAIT_VARIANTS:
+        abort(404)
+    source_path = safe_join(PORTRAIT_DIR, filename)
+    if source_path is None or not os.path.isfile(source_path):
+        abort(404)
+    response = send_file(get_portrait_variant(source_path, variant, PORTRAIT_CACHE_DIR), conditional=True)
+    if source_digest(source_path)[:12] == fingerprint:
+        _cache_forever(response)
+    return response
+
+@app.route('/icons/<fingerprint>.css')
+def status_icon_atlas(fingerprint):
+    """
+    Sert la feuille de style de l'atlas des icônes de statut (voir 'assets.icon_atlas()').
+    Mise en cache sans revalidation si l'empreinte est celle de l'atlas courant.
+    """
+    atlas = icon_atlas(models.STATUS_EFFECTS)
+    response = app.response_class(atlas['css'], mimetype='text/css')
+    if atlas['fingerprint'] == fingerprint:
+        _cache_forever(response)
+    else:
+        response.cache_control.no_cache = True
+    return response
+
+@app.route('/assets/<fingerprint>/<path:filename>')
+def fingerprinted_static(fingerprint, filename):
+    """
+    Sert un fichier statique sous son URL avec empreinte (voir 'assets.asset_url()').
+    Mis en cache sans revalidation si l'empreinte est celle du manifeste.
+    """
+    response = send_from_directory(app.static_folder, filename)
+    if manifest.get(filename) == fingerprint:
+        _cache_forever(response)
+    return response
+
+@app.route('/api/encounters')
+def api_encounters():
+    """
+    API de recherche dans la bibliothèque de rencontres, paginée.
+    Paramètres : 'q' (texte cherché dans le nom), 'page' (à partir de 1) et 'per_page'.
+    """
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', utils.ENCOUNTERS_PER_PAGE, type=int)
+    results = utils.search_encounters(request.args.get('q', ''), page, per_page)
+    return jsonify({'success': True, **results})
+
+@tracker.route('/api/view_content')
 def api_view_content():
     """API qui retourne uniquement le HTML de la table pour la vue joueur."""
-    return render_template('_view_table.html', 
-                             participants=models.initiative_data, 
-                             current_turn_index=models.current_turn_index)
+    return render_cached('_view_table.html', 
+                         participants=table.initiative_data, 
+                         current_turn_index=table.current_turn_index)
 
-@app.route('/api/portrait_content')
+@tracker.route('/api/portrait_content')
 def api_portrait_content():
     """API qui retourne uniquement le HTML de la vue portrait."""
     active_participant = None
-    if models.initiative_data and 0 <= models.current_turn_index < len(models.initiative_data):
-        active_participant = models.initiative_data[models.current_turn_index]
-    return render_template('_portrait.html', participant=active_participant)
+    if table.initiative_data and 0 <= table.current_turn_index < len(table.initiative_data):
+        active_participant = table.initiative_data[table.current_turn_index]
+    return render_cached('_portrait.html', participant=active_participant)
 
-@app.route('/api/main_content')
+@tracker.route('/api/main_content')
 def api_main_content():
     """API qui retourne uniquement le HTML de la table principale pour la vue MJ."""
-    return render_template('_main_table.html', 
-                             participants=models.initiative_data, 
-                             current_turn_index=models.current_turn_index,
-                             all_statuses=models.STATUS_EFFECTS)
+    return render_cached('_main_table.html', 
+                         participants=table.initiative_data, 
+                         current_turn_index=table.current_turn_index,
+                         all_statuses=models.STATUS_EFFECTS)
+
+
+# --- Enregistrement des routes de table ---
+
+app.register_blueprint(tracker)
+app.register_blueprint(tracker, url_prefix='/t/<table_id>', name='table')
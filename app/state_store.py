@@ -0,0 +1,174 @@
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# --- Stockage de l'état des tables ---
+# L'état des combats peut être conservé dans la mémoire du processus (par défaut) ou dans
+# un stockage clé-valeur externe compatible Redis, partagé par plusieurs processus serveur.
+#
+# Un stockage expose :
+# - get(table_id) : l'état à jour d'une table (un objet 'Tracker'), créé s'il n'existe pas ;
+# - lock(table_id) : un verrou (acquire/release) à tenir pendant une mutation de la table ;
+# - save(table) : l'enregistrement de l'état après une mutation ;
+# - shared : True si l'état est partagé entre plusieurs processus.
+
+
+class _NoLock:
+    """Verrou factice : un seul processus, les mutations d'une requête ne s'entrelacent pas."""
+    def acquire(self, *args, **kwargs):
+        return True
+
+    def release(self):
+        pass
+
+
+class _RedisTableLock:
+    """
+    Verrou Redis d'une table. 'acquire()' retourne False si le verrou n'a pas pu être pris avant
+    'blocking_timeout'. Si le verrou a expiré avant d'être relâché (mutation plus longue que sa durée
+    de vie), un autre processus a pu modifier la table entre-temps : c'est signalé dans le journal
+    au lieu de faire échouer la fin de la requête.
+    """
+    def __init__(self, lock):
+        self.lock = lock
+
+    def acquire(self):
+        return self.lock.acquire()
+
+    def release(self):
+        from redis.exceptions import LockError
+        try:
+            self.lock.release()
+        except LockError:
+            logger.warning("Verrou de table expiré avant d'être relâché lock=%s timeout=%s",
+                           self.lock.name, self.lock.timeout)
+
+
+class MemoryStateStore:
+    """
+    Stockage de l'état dans la mémoire du processus.
+    Les objets 'Tracker' sont eux-mêmes la source de vérité : rien n'est sérialisé.
+    Convient à un serveur lancé en un seul processus.
+    """
+    shared = False
+
+    def __init__(self, tracker_class):
+        """
+        Args:
+            tracker_class (type): La classe d'état d'une table ('models.Tracker').
+        """
+        self.tracker_class = tracker_class
+        self.tables = {}
+
+    def get(self, table_id):
+        """Retourne l'état de la table 'table_id', en le créant s'il n'existe pas encore."""
+        table = self.tables.get(table_id)
+        if table is None:
+            table = self.tables[table_id] = self.tracker_class(table_id)
+        return table
+
+    def lock(self, table_id):
+        """Retourne le verrou de la table (factice en mémoire)."""
+        return _NoLock()
+
+    def save(self, table):
+        """Rien à enregistrer : l'état en mémoire est déjà à jour."""
+        table.saved_revision = table.state_revision
+
+
+class RedisStateStore:
+    """
+    Stockage de l'état dans un serveur compatible Redis, partagé par plusieurs processus.
+
+    Pour chaque table, le serveur conserve :
+    - '<prefixe>:table:<id>:state' : l'état sérialisé en JSON ('Tracker.to_state()') ;
+    - '<prefixe>:table:<id>:rev' : la révision de cet état ;
+    - '<prefixe>:table:<id>:deltas' : les derniers deltas émis, pour rattraper les clients en retard ;
+    - '<prefixe>:table:<id>:lock' : le verrou tenu pendant une mutation.
+
+    Chaque processus garde une copie locale de l'état, rechargée seulement si la révision
+    enregistrée a changé : une lecture coûte un simple GET de la révision.
+    """
+    shared = True
+    # Durée de vie (en secondes) d'un verrou, au cas où un processus s'arrêterait en le tenant.
+    LOCK_TIMEOUT = 10
+
+    def __init__(self, client, tracker_class, prefix='webtracker', history_size=256):
+        """
+        Args:
+            client: Un client Redis (redis.Redis, ou fakeredis.FakeRedis pour les essais).
+            tracker_class (type): La classe d'état d'une table ('models.Tracker').
+            prefix (str, optional): Le préfixe des clés. Par défaut 'webtracker'.
+            history_size (int, optional): Le nombre de deltas conservés par table.
+        """
+        self.client = client
+        self.tracker_class = tracker_class
+        self.prefix = prefix
+        self.history_size = history_size
+        self.tables = {}
+
+    def _key(self, table_id, name):
+        return f"{self.prefix}:table:{table_id}:{name}"
+
+    def get(self, table_id):
+        """Retourne l'état à jour de la table 'table_id', rechargé depuis Redis s'il a changé."""
+        local = self.tables.get(table_id)
+        remote_revision = self.client.get(self._key(table_id, 'rev'))
+        if remote_revision is None:
+            # Table encore jamais enregistrée.
+            if local is None:
+                local = self.tables[table_id] = self.tracker_class(table_id)
+            return local
+        if local is None or local.state_revision != int(remote_revision):
+            pipe = self.client.pipeline()
+            pipe.get(self._key(table_id, 'state'))
+            pipe.lrange(self._key(table_id, 'deltas'), 0, -1)
+            state, deltas = pipe.execute()
+            local = self.tracker_class.from_state(table_id, json.loads(state))
+            local.delta_history.extend(json.loads(d) for d in deltas)
+            self.tables[table_id] = local
+        return local
+
+    def lock(self, table_id):
+        """Retourne le verrou Redis de la table, à tenir pendant une mutation."""
+        return _RedisTableLock(self.client.lock(self._key(table_id, 'lock'), timeout=self.LOCK_TIMEOUT,
+                                                blocking_timeout=self.LOCK_TIMEOUT))
+
+    def save(self, table):
+        """Enregistre l'état de la table et les deltas émis depuis le dernier enregistrement."""
+        if table.state_revision == table.saved_revision:
+            return
+        new_deltas = [json.dumps(d, separators=(',', ':'))
+                      for d in table.delta_history if d['rev'] > table.saved_revision]
+        pipe = self.client.pipeline()
+        pipe.set(self._key(table.id, 'state'), json.dumps(table.to_state(), separators=(',', ':')))
+        pipe.set(self._key(table.id, 'rev'), table.state_revision)
+        if new_deltas:
+            pipe.rpush(self._key(table.id, 'deltas'), *new_deltas)
+            pipe.ltrim(self._key(table.id, 'deltas'), -self.history_size, -1)
+        pipe.execute()
+        table.saved_revision = table.state_revision
+
+
+def create_state_store(backend, tracker_class, history_size=256):
+    """
+    Crée le stockage d'état correspondant à la configuration 'STATE_BACKEND'.
+
+    Args:
+        backend (str): 'memory', ou une URL Redis ('redis://hote:6379/0').
+        tracker_class (type): La classe d'état d'une table ('models.Tracker').
+        history_size (int, optional): Le nombre de deltas conservés par table.
+
+    Returns:
+        Le stockage d'état.
+    """
+    if backend == 'memory':
+        return MemoryStateStore(tracker_class)
+    if backend.startswith(('redis://', 'rediss://', 'unix://')):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("Le paquet 'redis' est nécessaire pour STATE_BACKEND=" + backend)
+        return RedisStateStore(redis.Redis.from_url(backend), tracker_class, history_size=history_size)
+    raise ValueError(f"STATE_BACKEND inconnu : {backend}")
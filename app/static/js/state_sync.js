@@ -0,0 +1,130 @@
+/*
+ * Miroir local de l'état du tracker, synchronisé par les deltas Socket.IO ('state_delta').
+ *
+ * Le serveur émet un delta à chaque changement d'état, avec une révision croissante.
+ * Le miroir applique les deltas dans l'ordre ; s'il détecte un trou (delta manqué,
+ * reconnexion), il demande à '/api/state' les deltas manquants ou un instantané complet.
+ * Après chaque mise à jour, la fonction 'onChange(mirror, deltas)' fournie par la page est appelée.
+ * 'deltas' vaut null après une resynchronisation complète.
+ */
+class TrackerMirror {
+    constructor(onChange, stateUrl = '/api/state') {
+        this.onChange = onChange;
+        this.stateUrl = stateUrl;
+        this.rev = null;
+        this.turn = 0;
+        this.order = [];
+        // Identifiants des prochains participants valides, dans l'ordre où leur tour viendra.
+        this.upcoming = [];
+        this.participants = new Map();
+        this.syncing = false;
+        this.queue = [];
+    }
+
+    // Liste des participants dans l'ordre d'initiative.
+    ordered() {
+        return this.order.map(id => this.participants.get(id)).filter(Boolean);
+    }
+
+    // Participant dont c'est le tour, ou null.
+    active() {
+        return this.participants.get(this.order[this.turn]) || null;
+    }
+
+    // Prochains participants (voir 'upcoming'), sans ceux qui ne sont plus dans l'état local.
+    upcomingParticipants() {
+        return this.upcoming.map(id => this.participants.get(id)).filter(Boolean);
+    }
+
+    loadSnapshot(snapshot) {
+        this.participants = new Map(snapshot.participants.map(p => [p.id, p]));
+        this.order = snapshot.participants.map(p => p.id);
+        this.turn = snapshot.turn;
+        this.upcoming = snapshot.upcoming || [];
+        this.rev = snapshot.rev;
+    }
+
+    applyDelta(delta) {
+        (delta.remove || []).forEach(id => this.participants.delete(id));
+        (delta.upsert || []).forEach(p => this.participants.set(p.id, p));
+        if (delta.order) {
+            this.order = delta.order;
+            const kept = new Set(delta.order);
+            for (const id of this.participants.keys()) {
+                if (!kept.has(id)) this.participants.delete(id);
+            }
+        } else if (delta.remove) {
+            this.order = this.order.filter(id => this.participants.has(id));
+        }
+        this.turn = delta.turn;
+        if (delta.upcoming) this.upcoming = delta.upcoming;
+        this.rev = delta.rev;
+    }
+
+    // Reçoit un delta du serveur et l'applique s'il fait suite à la révision locale.
+    receive(delta) {
+        if (this.syncing) {
+            this.queue.push(delta);
+            return;
+        }
+        if (this.rev !== null && delta.rev <= this.rev) return; // Déjà appliqué.
+        if (delta.base !== this.rev) {
+            this.queue.push(delta);
+            this.sync();
+            return;
+        }
+        this.applyDelta(delta);
+        this.onChange(this, [delta]);
+    }
+
+    // Rattrape l'état du serveur depuis la révision locale (ou charge un instantané complet).
+    async sync() {
+        this.syncing = true;
+        try {
+            const url = this.rev === null ? this.stateUrl : `${this.stateUrl}?since=${this.rev}`;
+            const data = await (await fetch(url)).json();
+            if (data.snapshot) {
+                this.loadSnapshot(data.snapshot);
+            } else {
+                data.deltas.forEach(d => this.applyDelta(d));
+            }
+        } catch (error) {
+            // Le prochain delta reçu relancera la synchronisation.
+            console.error('Error synchronizing state:', error);
+            this.queue = [];
+            return;
+        } finally {
+            this.syncing = false;
+        }
+
+        // Applique les deltas reçus pendant la resynchronisation.
+        const queued = this.queue;
+        this.queue = [];
+        for (const delta of queued) {
+            if (delta.rev <= this.rev) continue;
+            if (delta.base !== this.rev) {
+                this.queue.push(delta);
+                return this.sync();
+            }
+            this.applyDelta(delta);
+        }
+        this.onChange(this, null);
+    }
+
+    // Connecte le miroir au serveur Socket.IO et rejoint la salle de la table 'tableId'.
+    // 'view' ('gm', 'player' ou 'portrait') identifie la page dans les mesures du serveur.
+    connect(socket, tableId, view) {
+        socket.on('connect', () => {
+            socket.emit('join_table', { table: tableId, view: view });
+            this.sync();
+        });
+        socket.on('state_delta', delta => this.receive(delta));
+    }
+}
+
+// Échappe une chaîne pour l'insérer dans du HTML.
+function escapeHtml(value) {
+    return String(value ?? '').replace(/[&<>"']/g, c => ({
+        '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'
+    })[c]);
+}
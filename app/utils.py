@@ -2,8 +2,18 @@ import os
 import json
 import time
 import random
+import logging
+import tempfile
+from app import app, metrics
 from app.models import Participant
 
+logger = logging.getLogger(__name__)
+
+try:
+    import msgpack
+except ImportError: # Dépendance optionnelle, seulement pour PERSISTENCE_FORMAT='msgpack'.
+    msgpack = None
+
 # --- Constantes pour la gestion des fichiers ---
 
 # Chemin vers le dossier 'data' qui stocke toutes les données JSON de l'application.
@@ -12,29 +22,130 @@ from app.models import Participant
 DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data')
 os.makedirs(DATA_DIR, exist_ok=True) # Crée le dossier 'data' s'il n'existe pas.
 
-# Chemin complet vers le fichier JSON stockant les informations des joueurs.
-PLAYERS_FILE = os.path.join(DATA_DIR, 'players.json')
+# Formats de sauvegarde reconnus, par extension de fichier. Les fichiers de tous les formats
+# restent lisibles ; les nouvelles sauvegardes utilisent le format 'PERSISTENCE_FORMAT'.
+FORMAT_EXTENSIONS = {'json': '.json', 'msgpack': '.msgpack'}
+SAVE_FORMAT = app.config['PERSISTENCE_FORMAT']
+if SAVE_FORMAT not in FORMAT_EXTENSIONS:
+    raise ValueError(f"PERSISTENCE_FORMAT inconnu : {SAVE_FORMAT}")
+if SAVE_FORMAT == 'msgpack' and msgpack is None:
+    raise RuntimeError("Le paquet 'msgpack' est nécessaire pour PERSISTENCE_FORMAT=msgpack")
+
+# Chemin complet vers le fichier stockant les informations des joueurs (dans le format de sauvegarde).
+PLAYERS_FILE = os.path.join(DATA_DIR, 'players' + FORMAT_EXTENSIONS[SAVE_FORMAT])
 
 # Chemin vers le dossier où les rencontres (groupes de PNJ) sont sauvegardées.
 ENCOUNTERS_DIR = os.path.join(DATA_DIR, 'encounters')
 os.makedirs(ENCOUNTERS_DIR, exist_ok=True) # Crée le dossier 'encounters' s'il n'existe pas.
 
+# Index des métadonnées des rencontres (nom, date, nombre de PNJ), conservé dans le dossier des
+# rencontres. Un fichier caché sans extension de sauvegarde n'est pas pris pour une rencontre.
+ENCOUNTER_INDEX_NAME = '.index'
+# Nombre de rencontres par page par défaut et maximal pour 'search_encounters()'.
+ENCOUNTERS_PER_PAGE = 50
+MAX_ENCOUNTERS_PER_PAGE = 200
+
+# --- Lecture et écriture des fichiers de sauvegarde ---
+
+def _format_of(path):
+    """Retourne le format d'un fichier de sauvegarde d'après son extension, ou None."""
+    extension = os.path.splitext(path)[1]
+    for fmt, ext in FORMAT_EXTENSIONS.items():
+        if ext == extension:
+            return fmt
+    return None
+
+def write_atomic(path, payload):
+    """
+    Écrit 'payload' (bytes) dans 'path' de façon atomique.
+    Les données sont écrites dans un fichier temporaire du même dossier, synchronisées sur disque,
+    puis le fichier temporaire remplace la cible : un arrêt en cours d'écriture laisse l'ancien
+    fichier intact.
+    """
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path) + '.', suffix='.tmp')
+    try:
+        with metrics.PERSISTENCE_DURATION.time('file_write'), os.fdopen(fd, 'wb') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+def write_data(path, data):
+    """Sauvegarde 'data' de façon atomique, dans le format indiqué par l'extension de 'path'."""
+    if _format_of(path) == 'msgpack':
+        payload = msgpack.packb(data, use_bin_type=True)
+    else:
+        # JSON compact : sans indentation ni espaces superflus.
+        payload = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    write_atomic(path, payload)
+
+def read_data(path):
+    """
+    Lit un fichier de sauvegarde dans le format indiqué par son extension.
+    Les anciens fichiers JSON indentés sont lus comme les fichiers compacts.
+
+    Raises:
+        ValueError: Si le contenu du fichier est illisible.
+    """
+    with metrics.PERSISTENCE_DURATION.time('file_read'), open(path, 'rb') as f:
+        payload = f.read()
+    if _format_of(path) == 'msgpack':
+        if msgpack is None:
+            raise ValueError(f"Le paquet 'msgpack' est nécessaire pour lire {path}")
+        try:
+            return msgpack.unpackb(payload, raw=False)
+        except Exception as e:
+            raise ValueError(str(e))
+    return json.loads(payload.decode('utf-8'))
+
+def _saved_file(base_path):
+    """
+    Retourne le fichier de sauvegarde le plus récent pour 'base_path' (chemin sans extension),
+    quel que soit son format, ou None s'il n'en existe aucun.
+    """
+    candidates = [base_path + ext for ext in FORMAT_EXTENSIONS.values() if os.path.exists(base_path + ext)]
+    return max(candidates, key=os.path.getmtime, default=None)
+
+def _remove_other_formats(path):
+    """Supprime les sauvegardes de même nom dans les autres formats, remplacées par 'path'."""
+    base_path = os.path.splitext(path)[0]
+    for ext in FORMAT_EXTENSIONS.values():
+        other = base_path + ext
+        if other != path and os.path.exists(other):
+            os.remove(other)
+
 # --- Fonctions de gestion des données (Sauvegarde et Chargement) ---
 
+def _participant_from_saved(data):
+    """
+    Recrée un participant à partir de données sauvegardées.
+    L'identifiant sauvegardé est ignoré : une rencontre peut être chargée plusieurs fois
+    et chaque participant chargé doit recevoir un nouvel identifiant.
+    Une action retenue ('on_hold') appartenait au combat sauvegardé : elle est aussi ignorée.
+    """
+    data.pop('id', None)
+    data.pop('on_hold', None)
+    return Participant.from_dict(data)
+
 def save_players(initiative_data):
     """
-    Sauvegarde les participants de type 'joueur' dans le fichier players.json.
+    Sauvegarde les participants de type 'joueur' dans le fichier des joueurs.
     
     Args:
         initiative_data (list): La liste complète des participants de la rencontre actuelle.
     """
     players = [p.to_dict() for p in initiative_data if p.role == 'player']
-    with open(PLAYERS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(players, f, ensure_ascii=False, indent=2)
+    write_data(PLAYERS_FILE, players)
+    _remove_other_formats(PLAYERS_FILE)
 
 def load_players(initiative_data):
     """
-    Charge les joueurs depuis le fichier players.json et les ajoute à la liste d'initiative.
+    Charge les joueurs depuis le fichier des joueurs (players.json, ou players.msgpack)
+    et les ajoute à la liste d'initiative.
     
     Args:
         initiative_data (list): La liste actuelle des participants.
@@ -42,18 +153,18 @@ def load_players(initiative_data):
     Returns:
         tuple: Un tuple contenant la liste d'initiative mise à jour et un booléen indiquant si le chargement a réussi.
     """
-    if os.path.exists(PLAYERS_FILE):
-        with open(PLAYERS_FILE, 'r', encoding='utf-8') as f:
-            players_data = json.load(f)
-            # Conserver les non-joueurs et y ajouter les joueurs chargés du fichier.
-            initiative_data = [p for p in initiative_data if p.role != 'player']
-            initiative_data.extend([Participant.from_dict(p_data) for p_data in players_data])
-            return initiative_data, True
+    players_file = _saved_file(os.path.splitext(PLAYERS_FILE)[0])
+    if players_file is not None:
+        players_data = read_data(players_file)
+        # Conserver les non-joueurs et y ajouter les joueurs chargés du fichier.
+        initiative_data = [p for p in initiative_data if p.role != 'player']
+        initiative_data.extend([_participant_from_saved(p_data) for p_data in players_data])
+        return initiative_data, True
     return initiative_data, False
 
 def save_encounter(name, initiative_data):
     """
-    Sauvegarde une rencontre (monstres et alliés PNJ) dans un fichier JSON dédié.
+    Sauvegarde une rencontre (monstres et alliés PNJ) dans un fichier dédié, au format de sauvegarde.
     
     Args:
         name (str): Le nom de la rencontre, utilisé pour le nom du fichier.
@@ -68,14 +179,22 @@ def save_encounter(name, initiative_data):
         'allies': [p.to_dict() for p in initiative_data if p.role == 'ally'],
         'date_created': time.strftime('%Y-%m-%d %H:%M:%S')
     }
-    filename = os.path.join(ENCOUNTERS_DIR, f"{name.replace(' ', '_')}.json")
-    with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(encounter, f, ensure_ascii=False, indent=2)
+    filename = os.path.join(ENCOUNTERS_DIR, name.replace(' ', '_') + FORMAT_EXTENSIONS[SAVE_FORMAT])
+    write_data(filename, encounter)
+    _remove_other_formats(filename)
+
+    # Met l'index à jour sans attendre le prochain listage.
+    entries = _load_encounter_index()
+    base_name = os.path.splitext(os.path.basename(filename))[0]
+    for ext in FORMAT_EXTENSIONS.values():
+        entries.pop(base_name + ext, None)
+    entries[os.path.basename(filename)] = _index_entry(os.path.basename(filename), encounter, os.stat(filename))
+    _save_encounter_index(entries)
     return filename
 
 def load_encounter(filename, initiative_data):
     """
-    Charge une rencontre depuis un fichier JSON et ajoute ses PNJ à la liste d'initiative.
+    Charge une rencontre depuis un fichier de sauvegarde et ajoute ses PNJ à la liste d'initiative.
     
     Args:
         filename (str): Le nom du fichier de la rencontre à charger.
@@ -84,47 +203,122 @@ def load_encounter(filename, initiative_data):
     Returns:
         tuple: Un tuple contenant la liste d'initiative mise à jour et un booléen indiquant le succès.
     """
-    if os.path.exists(filename):
-        with open(filename, 'r', encoding='utf-8') as f:
-            encounter = json.load(f)
-            monsters = [Participant.from_dict(m) for m in encounter.get('monsters', [])]
-            allies = [Participant.from_dict(a) for a in encounter.get('allies', [])]
-            
-            # Relance l'initiative pour les PNJ chargés pour qu'ils ne gardent pas leur ancienne initiative.
-            for p in monsters + allies:
-                if p.status['class'] not in ['status-dead', 'status-out']:
-                    p.initiative_roll = random.randint(1, 20)
-                    p.is_critical = False
-
-            initiative_data.extend(monsters)
-            initiative_data.extend(allies)
-            return initiative_data, True
+    if os.path.exists(filename) and _format_of(filename) is not None:
+        encounter = read_data(filename)
+        monsters = [_participant_from_saved(m) for m in encounter.get('monsters', [])]
+        allies = [_participant_from_saved(a) for a in encounter.get('allies', [])]
+
+        # Relance l'initiative pour les PNJ chargés pour qu'ils ne gardent pas leur ancienne initiative.
+        for p in monsters + allies:
+            if p.status['class'] not in ['status-dead', 'status-out']:
+                p.initiative_roll = random.randint(1, 20)
+                p.is_critical = False
+
+        initiative_data.extend(monsters)
+        initiative_data.extend(allies)
+        return initiative_data, True
     return initiative_data, False
 
+# --- Index des rencontres ---
+# Lister les rencontres ne relit que les fichiers ajoutés ou modifiés depuis le dernier listage :
+# chaque entrée de l'index garde la date de modification et la taille du fichier décrit.
+
+# Cache en mémoire de l'index : les entrées et le dossier de rencontres auquel elles correspondent.
+_encounter_index = {'directory': None, 'entries': {}}
+
+def _load_encounter_index():
+    """Retourne les entrées de l'index (nom de fichier -> métadonnées), lues depuis le disque au premier appel."""
+    if _encounter_index['directory'] != ENCOUNTERS_DIR:
+        entries = {}
+        try:
+            with open(os.path.join(ENCOUNTERS_DIR, ENCOUNTER_INDEX_NAME), 'rb') as f:
+                entries = json.loads(f.read().decode('utf-8'))
+        except (OSError, ValueError):
+            pass # Index absent ou illisible : il est reconstruit au prochain listage.
+        _encounter_index['directory'] = ENCOUNTERS_DIR
+        _encounter_index['entries'] = entries
+    return _encounter_index['entries']
+
+def _save_encounter_index(entries):
+    """Enregistre l'index sur disque et le garde en cache."""
+    _encounter_index['directory'] = ENCOUNTERS_DIR
+    _encounter_index['entries'] = entries
+    payload = json.dumps(entries, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    write_atomic(os.path.join(ENCOUNTERS_DIR, ENCOUNTER_INDEX_NAME), payload)
+
+def _index_entry(filename, encounter, stat):
+    """Construit l'entrée d'index d'une rencontre à partir de ses données et de son 'os.stat()'."""
+    return {
+        'name': encounter.get('name', 'Sans nom'),
+        'filename': filename,
+        'date_created': encounter.get('date_created', ''),
+        'monster_count': len(encounter.get('monsters', [])),
+        'ally_count': len(encounter.get('allies', [])),
+        'mtime_ns': stat.st_mtime_ns,
+        'size': stat.st_size,
+    }
+
 def list_encounters():
     """
-    Liste toutes les rencontres sauvegardées dans le dossier 'encounters'.
+    Liste toutes les rencontres sauvegardées dans le dossier 'encounters', triées par nom.
+
+    Les métadonnées viennent de l'index : seuls les fichiers dont la date de modification ou la
+    taille a changé sont relus, et l'index est enregistré s'il a changé.
     
     Returns:
         list: Une liste de dictionnaires, chaque dictionnaire représentant une rencontre
               avec ses métadonnées (nom, nom de fichier, date, nombre de PNJ).
     """
-    encounters = []
     if not os.path.exists(ENCOUNTERS_DIR):
-        return encounters
-    for filename in os.listdir(ENCOUNTERS_DIR):
-        if filename.endswith('.json'):
-            file_path = os.path.join(ENCOUNTERS_DIR, filename)
-            with open(file_path, 'r', encoding='utf-8') as f:
+        return []
+    entries = _load_encounter_index()
+    current = {}
+    changed = False
+    with os.scandir(ENCOUNTERS_DIR) as scan:
+        for file_entry in scan:
+            if _format_of(file_entry.name) is None or not file_entry.is_file():
+                continue
+            stat = file_entry.stat()
+            entry = entries.get(file_entry.name)
+            if entry is None or entry['mtime_ns'] != stat.st_mtime_ns or entry['size'] != stat.st_size:
                 try:
-                    encounter = json.load(f)
-                    encounters.append({
-                        'name': encounter.get('name', 'Sans nom'),
-                        'filename': filename,
-                        'date_created': encounter.get('date_created', ''),
-                        'monster_count': len(encounter.get('monsters', [])),
-                        'ally_count': len(encounter.get('allies', []))
-                    })
-                except json.JSONDecodeError:
-                    print(f"Erreur de décodage JSON dans le fichier: {filename}")
+                    entry = _index_entry(file_entry.name, read_data(file_entry.path), stat)
+                except ValueError:
+                    logger.warning("Fichier de rencontre illisible file=%s", file_entry.name)
+                    # Gardé dans l'index pour ne pas relire le fichier tant qu'il n'a pas changé.
+                    entry = {'filename': file_entry.name, 'error': True,
+                             'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+                changed = True
+            current[file_entry.name] = entry
+    if changed or len(current) != len(entries):
+        _save_encounter_index(current)
+
+    encounters = [
+        {key: entry[key] for key in ('name', 'filename', 'date_created', 'monster_count', 'ally_count')}
+        for entry in current.values() if not entry.get('error')
+    ]
+    encounters.sort(key=lambda e: (e['name'].casefold(), e['filename']))
     return encounters
+
+def search_encounters(query='', page=1, per_page=ENCOUNTERS_PER_PAGE):
+    """
+    Recherche des rencontres par nom et retourne une page de résultats.
+
+    Args:
+        query (str, optional): Le texte à chercher dans le nom (sans tenir compte de la casse).
+        page (int, optional): Le numéro de la page, à partir de 1.
+        per_page (int, optional): Le nombre de rencontres par page (au plus 'MAX_ENCOUNTERS_PER_PAGE').
+
+    Returns:
+        dict: Les rencontres de la page ('encounters'), le nombre total de rencontres trouvées
+              ('total'), le numéro de page et la taille de page effectivement utilisés.
+    """
+    encounters = list_encounters()
+    query = query.strip().casefold()
+    if query:
+        encounters = [e for e in encounters if query in e['name'].casefold()]
+    page = max(page, 1)
+    per_page = min(max(per_page, 1), MAX_ENCOUNTERS_PER_PAGE)
+    start = (page - 1) * per_page
+    return {'encounters': encounters[start:start + per_page], 'total': len(encounters),
+            'page': page, 'per_page': per_page}
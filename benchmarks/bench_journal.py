@@ -0,0 +1,75 @@
+"""
+Benchmark du journal des événements ('app.journal').
+
+Mesure le coût d'un ajout au journal pour un delta typique ('Tour Suivant', blessure),
+avec la synchronisation sur disque regroupée (par défaut) et à chaque événement,
+ainsi que le coût d'un instantané complet selon la taille de la rencontre.
+
+Usage :
+    python benchmarks/bench_journal.py
+"""
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+warnings.filterwarnings('ignore')
+# Le benchmark écrit dans un dossier temporaire, sans toucher au journal du serveur.
+os.environ['WEBTRACKER_JOURNAL_DIR'] = tempfile.mkdtemp()
+
+from app import models
+from app.journal import EventJournal
+from app.models import Participant
+
+APPENDS = 2000
+SIZES = [10, 100, 1000, 5000]
+
+def make_table(size):
+    table = models.Tracker('bench')
+    table.add_participants([Participant(f"Extra {i}", 'monster', 'Extra', False, initiative_roll=i % 20)
+                            for i in range(size)])
+    return table
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+def bench_appends(fsync_interval):
+    """Retourne les durées (en ms) de 'APPENDS' ajouts de deltas typiques."""
+    journal = EventJournal(tempfile.mkdtemp(), fsync_interval=fsync_interval, snapshot_every=APPENDS + 1)
+    table = make_table(20)
+    target = table.initiative_data[3]
+    durations = []
+    for rev in range(1, APPENDS + 1):
+        if rev % 2:
+            delta = {'rev': rev, 'base': rev - 1, 'turn': rev % 20}
+        else:
+            target.wounds = rev % 4
+            delta = {'rev': rev, 'base': rev - 1, 'turn': rev % 20, 'upsert': [models.participant_payload(target)]}
+        start = time.perf_counter()
+        journal.append(table, delta)
+        durations.append((time.perf_counter() - start) * 1000)
+    journal.sync()
+    return durations
+
+def main():
+    print(f"Ajouts au journal ({APPENDS} deltas typiques)")
+    print(f"{'synchronisation':>24} | {'médiane (ms)':>12} | {'p99 (ms)':>9}")
+    for label, interval in (("regroupée (1 s)", 1.0), ("à chaque événement", 0)):
+        durations = bench_appends(interval)
+        print(f"{label:>24} | {percentile(durations, 0.5):>12.4f} | {percentile(durations, 0.99):>9.4f}")
+
+    print()
+    print("Instantané complet (amorti sur 'WEBTRACKER_JOURNAL_SNAPSHOT_EVERY' événements)")
+    print(f"{'participants':>12} | {'durée (ms)':>10}")
+    journal = EventJournal(tempfile.mkdtemp())
+    for size in SIZES:
+        table = make_table(size)
+        start = time.perf_counter()
+        journal.snapshot(table)
+        print(f"{size:>12} | {(time.perf_counter() - start) * 1000:>10.3f}")
+
+if __name__ == '__main__':
+    main()
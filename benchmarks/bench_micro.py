@@ -0,0 +1,220 @@
+"""
+Microbenchmarks des opérations coûteuses du serveur, comparés à des mesures de référence.
+
+Mesure (durée médiane sur REPEAT essais) :
+- 'Tracker.sort_participants()' : tri complet d'une table dont toutes les initiatives ont changé ;
+- 'Tracker.new_round()' : nouvelle manche ;
+- 'utils.list_encounters()' : listage de la bibliothèque de rencontres, index chaud et à froid ;
+- 'PortraitIndex.listing()' : listage d'un dossier de portraits déjà indexé (un seul appel système) ;
+- 'PortraitIndex.search()' : recherche dans tous les dossiers, y compris la vérification des dates de
+  modification de toute l'arborescence ('refresh()') faite à chaque recherche ;
+- 'PortraitIndex.refresh()' à froid : construction de l'index de toute l'arborescence.
+
+Les mesures sont comparées à celles de 'baselines.json' (dans ce dossier) : une mesure plus lente
+que sa référence de plus de '--tolerance' est signalée comme régression, et le script se termine
+alors avec le code 1. Les mesures dont la référence dure moins de GATE_MIN_MS sont affichées mais
+jamais signalées : à cette échelle, le bruit de la machine dépasse la tolérance. Pour comparer des machines de vitesses différentes, chaque mesure est rapportée
+à une boucle d'étalonnage en Python pur, chronométrée pendant la même exécution ('calibration') :
+c'est ce rapport qui est comparé à celui de la référence. Si la référence a été enregistrée sur une
+autre machine (ou une autre version de Python), les régressions sont seulement signalées, sans code
+d'erreur. Après une optimisation voulue, enregistrez de nouvelles références avec '--save'.
+
+Usage :
+    python benchmarks/bench_micro.py [--save] [--tolerance 0.3]
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import warnings
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+warnings.filterwarnings('ignore')
+os.environ.setdefault('WEBTRACKER_JOURNAL_DIR', '')
+
+from app import app, utils
+from app.models import Participant, Tracker
+from app.portrait_utils import PortraitIndex, _RACY_WINDOW_NS
+
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines.json')
+REPEAT = 9
+# Durée (en ms) de référence en dessous de laquelle une mesure n'est pas vérifiée.
+GATE_MIN_MS = 5
+TABLE_SIZE = 1000
+MASS_BATTLE_SIZE = 20000
+ENCOUNTERS = 300
+PORTRAITS = 1000
+# Arborescence de portraits : PORTRAITS images à la racine, et PORTRAIT_FOLDERS dossiers
+# de PORTRAIT_SUBFOLDERS sous-dossiers de FOLDER_PORTRAITS images chacun.
+PORTRAIT_FOLDERS = 20
+PORTRAIT_SUBFOLDERS = 5
+FOLDER_PORTRAITS = 50
+# Taille de la boucle d'étalonnage.
+CALIBRATION_SIZE = 20000
+
+def timed(setup, function):
+    """Durée médiane (en ms) de 'function(*setup())', préparation exclue."""
+    durations = []
+    for _ in range(REPEAT):
+        args = setup()
+        gc.collect()
+        gc.disable()
+        start = time.perf_counter()
+        function(*args)
+        durations.append(time.perf_counter() - start)
+        gc.enable()
+    return statistics.median(durations) * 1000
+
+def calibration():
+    """
+    Durée (en ms) d'une charge de référence en Python pur (tri de tuples, dictionnaire, chaînes),
+    indépendante du code mesuré : elle donne la vitesse de la machine pour cette exécution.
+    """
+    rng = random.Random(0)
+    items = [(rng.randint(1, 20), f"Nom {i}") for i in range(CALIBRATION_SIZE)]
+    def work():
+        index = {name: roll for roll, name in sorted(items, reverse=True)}
+        return sum(len(name) for name in index)
+    return timed(lambda: (), work)
+
+def machine():
+    """Description de la machine et de la version de Python, enregistrée avec les références."""
+    return f"{platform.machine()} {platform.system()}, Python {platform.python_version()}"
+
+def battle(count, seed=0):
+    """Une table de 'count' participants (2 % de joueurs, des Extra en majorité)."""
+    rng = random.Random(seed)
+    table = Tracker('bench')
+    table.update_state = lambda changed=None, removed=None: None # Diffusion hors mesure.
+    participants = []
+    for i in range(count):
+        p = Participant(f"Combattant {i}", 'monster', 'Joker' if i % 5 == 0 else 'Extra', i % 50 == 0,
+                        initiative_roll=rng.randint(1, 20), wounds=rng.choice([0, 0, 0, 1]))
+        if rng.random() < 0.3:
+            p.statuses = [{'name': 'Secoué', 'duration': rng.randint(1, 3)}]
+        participants.append(p)
+    table.set_participants(participants)
+    return table
+
+def rerolled(count):
+    def setup():
+        table = battle(count)
+        for p in table.initiative_data:
+            p.initiative_roll = random.randint(1, 20)
+        return (table,)
+    return setup
+
+def encounter_library():
+    """Crée une bibliothèque de ENCOUNTERS rencontres dans un dossier temporaire."""
+    utils.ENCOUNTERS_DIR = tempfile.mkdtemp()
+    for i in range(ENCOUNTERS):
+        npcs = [Participant(f"PNJ {j}", 'monster', 'Extra', False) for j in range(10)]
+        utils.save_encounter(f"Rencontre {i}", npcs)
+
+def cold_index():
+    """Oublie l'index des rencontres (en mémoire et sur disque) : tout doit être relu."""
+    utils._encounter_index['directory'] = None
+    index = os.path.join(utils.ENCOUNTERS_DIR, utils.ENCOUNTER_INDEX_NAME)
+    if os.path.exists(index):
+        os.remove(index)
+    return ()
+
+def portrait_tree():
+    """Crée l'arborescence de portraits dans un dossier temporaire ; retourne son nombre total d'images."""
+    base_dir = tempfile.mkdtemp()
+    folders = ['']
+    for i in range(PORTRAIT_FOLDERS):
+        folders.append(f"Dossier {i:02d}")
+        folders.extend(f"Dossier {i:02d}/Sous-dossier {j}" for j in range(PORTRAIT_SUBFOLDERS))
+    for folder in folders:
+        os.makedirs(os.path.join(base_dir, folder), exist_ok=True)
+        for k in range(PORTRAITS if not folder else FOLDER_PORTRAITS):
+            open(os.path.join(base_dir, folder, f"portrait-{k:04d}.jpg"), 'wb').close()
+    # Vieillit les dates de modification : un dossier modifié à l'instant serait relu à chaque appel.
+    old = time.time_ns() - 2 * _RACY_WINDOW_NS
+    for folder in folders:
+        os.utime(os.path.join(base_dir, folder), ns=(old, old))
+    return base_dir, PORTRAITS + (len(folders) - 1) * FOLDER_PORTRAITS
+
+def measure():
+    """Retourne les mesures, par nom, en millisecondes."""
+    results = {}
+    with app.app_context():
+        results[f"sort_participants[{TABLE_SIZE}]"] = timed(rerolled(TABLE_SIZE), lambda t: t.sort_participants())
+        results[f"sort_participants[{MASS_BATTLE_SIZE}]"] = timed(rerolled(MASS_BATTLE_SIZE), lambda t: t.sort_participants())
+        results[f"new_round[{TABLE_SIZE}]"] = timed(lambda: (battle(TABLE_SIZE),), lambda t: t.new_round())
+        results[f"new_round[{MASS_BATTLE_SIZE}]"] = timed(lambda: (battle(MASS_BATTLE_SIZE),), lambda t: t.new_round())
+
+    encounter_library()
+    utils.list_encounters()
+    results[f"list_encounters[{ENCOUNTERS}]"] = timed(lambda: (), utils.list_encounters)
+    results[f"list_encounters_cold[{ENCOUNTERS}]"] = timed(cold_index, utils.list_encounters)
+
+    base_dir, images = portrait_tree()
+    index = PortraitIndex(base_dir)
+    index.refresh()
+    results[f"portrait_index.listing[{PORTRAITS}]"] = timed(lambda: (), lambda: index.listing(''))
+    results[f"portrait_index.search[{images}]"] = timed(lambda: (), lambda: index.search('portrait-00'))
+    results[f"portrait_index.refresh_cold[{images}]"] = timed(lambda: (PortraitIndex(base_dir),), lambda i: i.refresh())
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--save', action='store_true', help="Enregistre les mesures comme nouvelles références")
+    parser.add_argument('--tolerance', type=float, default=0.3,
+                        help="Ralentissement toléré par rapport à la référence (0.3 : 30 %%)")
+    args = parser.parse_args()
+
+    # L'étalonnage est mesuré avant et après les mesures ; la meilleure durée est retenue.
+    calibration_before = calibration()
+    results = measure()
+    calibration_ms = min(calibration_before, calibration())
+    baselines = {}
+    if os.path.exists(BASELINES):
+        with open(BASELINES, encoding='utf-8') as f:
+            baselines = json.load(f)
+    reference = baselines.get('results', {})
+    # Sans étalonnage dans la référence (anciennes références), les durées sont comparées telles quelles.
+    speed = calibration_ms / baselines['calibration'] if baselines.get('calibration') else 1.0
+    same_machine = baselines.get('machine') == machine()
+
+    regressions = []
+    print(f"Étalonnage : {calibration_ms:.2f} ms (référence : {baselines.get('calibration', '-')} ms, "
+          f"machine de référence : {baselines.get('machine', '-')})")
+    print(f"{'mesure':>36} | {'durée':>10} | {'référence':>10} | {'écart':>7}")
+    for name, ms in results.items():
+        if name in reference:
+            # La référence est ramenée à la vitesse de la machine mesurée pendant cette exécution.
+            ratio = ms / (reference[name] * speed) - 1
+            if reference[name] < GATE_MIN_MS:
+                flag = '  (non vérifiée)'
+            else:
+                flag = '  RÉGRESSION' if ratio > args.tolerance else ''
+            if flag == '  RÉGRESSION':
+                regressions.append(name)
+            print(f"{name:>36} | {ms:7.2f} ms | {reference[name]:7.2f} ms | {ratio:+6.0%}{flag}")
+        else:
+            print(f"{name:>36} | {ms:7.2f} ms | {'-':>10} | {'-':>7}")
+
+    if args.save:
+        with open(BASELINES, 'w', encoding='utf-8') as f:
+            json.dump({'machine': machine(), 'calibration': round(calibration_ms, 3),
+                       'results': {name: round(ms, 3) for name, ms in results.items()}}, f, indent=2)
+            f.write('\n')
+        print(f"Références enregistrées dans {BASELINES}")
+    elif regressions:
+        print(f"{len(regressions)} régression(s) au-delà de {args.tolerance:.0%} : {', '.join(regressions)}")
+        if not same_machine:
+            print("Références enregistrées sur une autre machine : avertissement seulement "
+                  "(enregistrez des références pour cette machine avec '--save').")
+            return
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Benchmark du passage à une nouvelle manche ('Nouvelle Manche') pour les batailles de masse.
+
+Pour des tables de tailles croissantes (surtout des Extra, dont une partie hors combat et
+avec des statuts à durée), compare :
+- l'ancienne boucle de la route '/new_round' (propriété 'status' calculée deux fois par participant,
+  listes de statuts reconstruites, un 'random.randint' par PNJ, puis tri complet) ;
+- 'Tracker.new_round()', qui reconstruit en plus l'index des positions et l'anneau des tours.
+
+'Tracker.new_round()' est un déplacement du calcul dans le modèle, pas une optimisation : les deux
+durées sont du même ordre, et la reconstruction de l'index et de l'anneau (qui rend ensuite le passage
+au tour suivant et les repositionnements immédiats) coûte un peu plus sur les grandes tables.
+
+Usage :
+    python benchmarks/bench_new_round.py
+"""
+import copy
+import gc
+import os
+import random
+import sys
+import time
+import warnings
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+warnings.filterwarnings('ignore')
+os.environ.setdefault('WEBTRACKER_JOURNAL_DIR', '')
+
+from app.models import Participant, Tracker
+
+SIZES = [100, 1000, 5000, 20000]
+REPEAT = 9
+
+def battle(count, seed=0):
+    """Une bataille de 'count' participants : 2 % de joueurs, 80 % d'Extra parmi les PNJ."""
+    rng = random.Random(seed)
+    participants = []
+    for i in range(count):
+        is_player = (i % 50 == 0)
+        p = Participant(f"Combattant {i}", 'player' if is_player else 'monster',
+                        'Joker' if is_player or rng.random() < 0.2 else 'Extra', is_player,
+                        initiative_roll=rng.randint(1, 20), wounds=rng.choice([0, 0, 0, 0, 1, 2]))
+        if rng.random() < 0.3:
+            p.statuses = [{'name': 'Secoué', 'duration': rng.randint(1, 3)}, {'name': 'Entravé', 'duration': None}]
+        participants.append(p)
+    return participants
+
+def old_new_round(table):
+    """Ancienne boucle de la route '/new_round', avant 'Tracker.new_round()'."""
+    table.current_turn_index = 0
+    for p in table.initiative_data:
+        if p.status['class'] in ['status-dead', 'status-out']:
+            continue
+        active_statuses = []
+        for status in p.statuses:
+            if isinstance(status, dict) and status.get('duration') is not None:
+                status['duration'] -= 1
+                if status['duration'] > 0:
+                    active_statuses.append(status)
+            else:
+                active_statuses.append(status)
+        p.statuses = active_statuses
+        if not p.is_player:
+            roll = random.randint(1, 20)
+            p.initiative_roll = roll
+            p.is_critical = (roll == 20)
+    table.initiative_data.sort(key=lambda p: (p.initiative_roll, p.name), reverse=True) # Ancien 'sort_participants()'.
+    table.current_turn_index = -1
+    for i, p in enumerate(table.initiative_data):
+        if p.status['class'] not in ['status-dead', 'status-out']:
+            table.current_turn_index = i
+            break
+
+def timed(participants, function):
+    """Meilleure durée (en ms) d'une nouvelle manche, sur une copie de la bataille à chaque fois."""
+    best = float('inf')
+    for _ in range(REPEAT):
+        table = Tracker('bench')
+        table.set_participants(copy.deepcopy(participants))
+        table.update_state = lambda **kwargs: None # Diffusion hors mesure.
+        gc.collect()
+        gc.disable() # Les copies de la bataille déclencheraient le ramasse-miettes pendant la mesure.
+        start = time.perf_counter()
+        function(table)
+        best = min(best, time.perf_counter() - start)
+        gc.enable()
+    return best * 1000
+
+def main():
+    print(f"{'participants':>12} | {'ancienne boucle':>15} | {'new_round()':>15}")
+    for count in SIZES:
+        participants = battle(count)
+        old = timed(participants, old_new_round)
+        new = timed(participants, lambda table: table.new_round())
+        print(f"{count:>12} | {old:12.2f} ms | {new:12.2f} ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark de l'ordre d'initiative pour les grandes rencontres (batailles de masse, hordes).
+
+Compare, pour des rencontres de plusieurs centaines à plusieurs milliers de PNJ :
+- l'ancienne approche (ajout en fin de liste puis tri complet à chaque mutation) ;
+- l'insertion et le repositionnement incrémentaux de 'app.models.Tracker'.
+
+Usage :
+    python benchmarks/bench_ordering.py
+"""
+import os
+import random
+import sys
+import time
+import warnings
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+warnings.filterwarnings('ignore')
+
+from app import models
+from app.models import Participant
+
+SIZES = [250, 500, 1000, 5000]
+OPERATIONS = 200
+
+def make_participant(i):
+    return Participant(f"Extra {i}", 'monster', 'Extra', False, initiative_roll=random.randint(1, 20))
+
+def bench_full_sort(base, newcomers, rerolls):
+    """Ancienne approche : tri complet de la liste après chaque ajout ou relance."""
+    data = list(base)
+    data.sort(key=lambda p: (p.initiative_roll, p.name), reverse=True)
+    start = time.perf_counter()
+    for p in newcomers:
+        data.append(p)
+        data.sort(key=lambda p: (p.initiative_roll, p.name), reverse=True)
+    add_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for p, roll in rerolls:
+        p.initiative_roll = roll
+        data.sort(key=lambda p: (p.initiative_roll, p.name), reverse=True)
+    reroll_time = time.perf_counter() - start
+    return add_time, reroll_time
+
+def bench_incremental(base, newcomers, rerolls):
+    """Nouvelle approche : insertion et repositionnement de la seule entrée modifiée."""
+    table = models.Tracker('bench')
+    table.set_participants(list(base))
+    table.current_turn_index = len(base) // 2
+    start = time.perf_counter()
+    for p in newcomers:
+        table.add_participants([p])
+    add_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for p, roll in rerolls:
+        p.initiative_roll = roll
+        table.reposition_participants([p])
+    reroll_time = time.perf_counter() - start
+    return add_time, reroll_time
+
+def main():
+    random.seed(42)
+    print(f"{'PNJ':>6} | {'ajout tri (ms)':>14} | {'ajout incr. (ms)':>16} | {'relance tri (ms)':>16} | {'relance incr. (ms)':>18}")
+    for size in SIZES:
+        base = [make_participant(i) for i in range(size)]
+        newcomers = [make_participant(size + i) for i in range(OPERATIONS)]
+        targets = random.sample(base, OPERATIONS)
+        rerolls = [(p, random.randint(1, 20)) for p in targets]
+        originals = [(p, p.initiative_roll) for p in targets]
+
+        full_add, full_reroll = bench_full_sort(base, newcomers, rerolls)
+        for p, roll in originals:
+            p.initiative_roll = roll
+        incr_add, incr_reroll = bench_incremental(base, newcomers, rerolls)
+
+        # Temps moyen par opération, en millisecondes.
+        per_op = lambda t: t / OPERATIONS * 1000
+        print(f"{size:>6} | {per_op(full_add):>14.4f} | {per_op(incr_add):>16.4f} | {per_op(full_reroll):>16.4f} | {per_op(incr_reroll):>18.4f}")
+
+if __name__ == '__main__':
+    main()
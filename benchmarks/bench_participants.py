@@ -0,0 +1,158 @@
+"""
+Benchmark de la représentation des participants pour les grandes tables.
+
+Pour une table de COUNT participants (surtout des Extra, une partie blessés et avec des statuts),
+compare l'ancienne classe 'Participant' (attributs dans un dictionnaire par instance, état dérivé
+recalculé à chaque accès, statuts en liste de dictionnaires propres à chaque participant) à la
+classe actuelle ('__slots__', état dérivé mémorisé, statuts partagés avec un masque de bits) :
+- la mémoire occupée par les participants (mesurée avec 'tracemalloc') ;
+- le coût d'un rendu : accès à l'état dérivé, construction des données des deltas
+  ('participant_payload()') et rendu des tables HTML des vues MJ et joueur.
+
+Usage :
+    python benchmarks/bench_participants.py
+"""
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+import warnings
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+warnings.filterwarnings('ignore')
+os.environ.setdefault('WEBTRACKER_JOURNAL_DIR', '')
+
+from flask import render_template
+from app import app, models
+from app.models import Participant
+
+COUNT = 10000
+REPEAT = 5
+
+class OldParticipant:
+    """Ancienne classe 'Participant' (réduite à ce qu'utilisent les rendus mesurés)."""
+    def __init__(self, name, role, p_type, is_player, initiative_roll=10, is_critical=False, wounds=0, portrait=None, statuses=None, id=None):
+        self.id = id or models.new_participant_id()
+        self.name = name
+        self.role = role
+        self.p_type = p_type
+        self.is_player = is_player
+        self.initiative_roll = initiative_roll
+        self.is_critical = is_critical
+        self.wounds = wounds
+        self.portrait = portrait
+        self.statuses = statuses if statuses is not None else []
+
+    @property
+    def status(self):
+        status_info = {'text': '', 'class': '', 'malus': 0}
+        if self.p_type == 'Extra':
+            if self.wounds >= 1:
+                status_info['text'] = 'Hors Combat'
+                status_info['class'] = 'status-dead'
+        else:
+            if self.wounds > 0:
+                status_info['malus'] = self.wounds
+                status_info['class'] = 'status-wounded'
+                status_info['text'] = f"-{self.wounds}"
+                if self.wounds >= 5:
+                    status_info['text'] = 'Mort'
+                    status_info['class'] = 'status-dead'
+                elif self.wounds >= 4:
+                    status_info['text'] = 'Incapacité'
+                    status_info['class'] = 'status-incapacitated'
+        return status_info
+
+    def to_dict(self):
+        return {
+            'id': self.id, 'name': self.name, 'role': self.role, 'p_type': self.p_type,
+            'is_player': self.is_player, 'initiative_roll': self.initiative_roll,
+            'is_critical': self.is_critical, 'wounds': self.wounds, 'portrait': self.portrait,
+            'statuses': self.statuses
+        }
+
+def old_payload(p):
+    """Ancien 'participant_payload()' : les statuts étaient copiés."""
+    data = p.to_dict()
+    data['statuses'] = [dict(s) for s in p.statuses]
+    data['status'] = p.status
+    data['portrait_url'] = None
+    return data
+
+def battle_data(count, seed=0):
+    """Données ('to_dict()') d'une bataille : 2 % de joueurs, 80 % d'Extra parmi les PNJ."""
+    rng = random.Random(seed)
+    data = []
+    for i in range(count):
+        is_player = (i % 50 == 0)
+        p_type = 'Joker' if is_player or rng.random() < 0.2 else 'Extra'
+        wounds = rng.choice([0, 0, 0, 0, 1, 2])
+        statuses = [{'name': 'Mort', 'duration': None}] if p_type == 'Extra' and wounds else []
+        if rng.random() < 0.3:
+            statuses += [{'name': 'Secoué', 'duration': rng.randint(1, 3)}, {'name': 'Entravé', 'duration': None}]
+        data.append({'id': f"{i:012x}", 'name': f"Combattant {i}", 'role': 'player' if is_player else 'monster',
+                     'p_type': p_type, 'is_player': is_player, 'initiative_roll': rng.randint(1, 20),
+                     'is_critical': False, 'wounds': wounds, 'portrait': None, 'statuses': statuses})
+    return data
+
+def build(cls, data):
+    return [cls(**{**d, 'statuses': [dict(s) for s in d['statuses']]}) for d in data]
+
+def memory(cls, data):
+    """Mémoire (en Mo) allouée pour construire les participants."""
+    gc.collect()
+    tracemalloc.start()
+    participants = build(cls, data)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del participants
+    return size / 1024 / 1024
+
+def timed(function):
+    """Meilleure durée (en ms) de 'function()'."""
+    best = float('inf')
+    for _ in range(REPEAT):
+        gc.collect()
+        gc.disable()
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+        gc.enable()
+    return best * 1000
+
+def render_costs(participants, payload):
+    """Durées (en ms) des différentes étapes d'un rendu de la table."""
+    def statuses():
+        for p in participants:
+            p.status['class']
+            p.status['text']
+    def payloads():
+        for p in participants:
+            payload(p)
+    def table(template):
+        def render():
+            render_template(template, participants=participants, current_turn_index=0,
+                            all_statuses=models.STATUS_EFFECTS)
+        return render
+    with app.test_request_context('/'):
+        app.preprocess_request() # Ouverture de la table, comme pour une requête.
+        return [timed(statuses), timed(payloads),
+                timed(table('_main_table.html')), timed(table('_view_table.html'))]
+
+def main():
+    data = battle_data(COUNT)
+    old, new = build(OldParticipant, data), build(Participant, data)
+    # L'URL des portraits n'est pas mesurée (aucun participant n'en a).
+    new_payload = models.participant_payload
+
+    print(f"{COUNT} participants")
+    print(f"{'':>28} | {'ancienne classe':>15} | {'classe actuelle':>15}")
+    print(f"{'mémoire':>28} | {memory(OldParticipant, data):12.2f} Mo | {memory(Participant, data):12.2f} Mo")
+    labels = ["accès à l'état dérivé", 'participant_payload()', 'rendu _main_table.html', 'rendu _view_table.html']
+    for label, old_ms, new_ms in zip(labels, render_costs(old, old_payload), render_costs(new, new_payload)):
+        print(f"{label:>28} | {old_ms:12.2f} ms | {new_ms:12.2f} ms")
+
+if __name__ == '__main__':
+    main()
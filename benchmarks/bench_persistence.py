@@ -0,0 +1,95 @@
+"""
+Benchmark de la persistance des rencontres ('app.utils').
+
+Pour des bibliothèques de plusieurs milliers de rencontres, compare :
+- l'ancien format (JSON indenté, écrit directement dans le fichier cible) ;
+- le JSON compact écrit de façon atomique ;
+- msgpack écrit de façon atomique (si le paquet 'msgpack' est installé).
+
+Mesure le temps de sauvegarde, le temps de listage ('list_encounters'), le temps de
+chargement d'une rencontre et la taille totale sur disque.
+
+Usage :
+    python benchmarks/bench_persistence.py
+"""
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import warnings
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+warnings.filterwarnings('ignore')
+os.environ.setdefault('WEBTRACKER_JOURNAL_DIR', '')
+
+from app import utils
+from app.models import Participant
+
+SIZES = [1000, 5000]
+NPCS_PER_ENCOUNTER = 12
+
+def make_encounter(i):
+    npcs = []
+    for j in range(NPCS_PER_ENCOUNTER):
+        p = Participant(f"Gobelin {j}", random.choice(['monster', 'ally']), 'Extra', False,
+                        initiative_roll=random.randint(1, 20), wounds=random.randint(0, 3),
+                        portrait='gobelin.png', statuses=[{'name': 'Secoué', 'duration': 2}])
+        npcs.append(p)
+    return f"Rencontre {i}", npcs
+
+def save_legacy(name, initiative_data):
+    """Ancienne sauvegarde : JSON indenté écrit directement dans le fichier cible."""
+    encounter = {
+        'name': name,
+        'monsters': [p.to_dict() for p in initiative_data if p.role == 'monster'],
+        'allies': [p.to_dict() for p in initiative_data if p.role == 'ally'],
+        'date_created': time.strftime('%Y-%m-%d %H:%M:%S')
+    }
+    with open(os.path.join(utils.ENCOUNTERS_DIR, f"{name.replace(' ', '_')}.json"), 'w', encoding='utf-8') as f:
+        json.dump(encounter, f, ensure_ascii=False, indent=2)
+
+def directory_size(path):
+    return sum(entry.stat().st_size for entry in os.scandir(path))
+
+def bench(label, fmt, encounters):
+    utils.ENCOUNTERS_DIR = tempfile.mkdtemp()
+    start = time.perf_counter()
+    if fmt is None:
+        for name, npcs in encounters:
+            save_legacy(name, npcs)
+    else:
+        utils.SAVE_FORMAT = fmt
+        for name, npcs in encounters:
+            utils.save_encounter(name, npcs)
+    save_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    listed = utils.list_encounters()
+    list_time = time.perf_counter() - start
+
+    sample = random.sample(listed, 100)
+    start = time.perf_counter()
+    for entry in sample:
+        utils.load_encounter(os.path.join(utils.ENCOUNTERS_DIR, entry['filename']), [])
+    load_time = (time.perf_counter() - start) / len(sample)
+
+    size = directory_size(utils.ENCOUNTERS_DIR)
+    print(f"{label:>22} | {save_time:>14.3f} | {list_time:>10.3f} | {load_time * 1000:>15.3f} | {size / 1024 / 1024:>11.2f}")
+
+def main():
+    formats = [("JSON indenté (ancien)", None), ("JSON compact atomique", 'json')]
+    if utils.msgpack is not None:
+        formats.append(("msgpack atomique", 'msgpack'))
+    else:
+        print("(msgpack non installé : format ignoré)")
+    for size in SIZES:
+        encounters = [make_encounter(i) for i in range(size)]
+        print(f"\n{size} rencontres de {NPCS_PER_ENCOUNTER} PNJ")
+        print(f"{'format':>22} | {'sauvegarde (s)':>14} | {'listage (s)':>10} | {'chargement (ms)':>15} | {'taille (Mo)':>11}")
+        for label, fmt in formats:
+            bench(label, fmt, encounters)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark de l'explorateur de portraits.
+
+Construit une arborescence factice de plusieurs milliers de portraits dans des dossiers imbriqués,
+puis compare pour chaque listage de dossier :
+- 'get_portraits_and_folders()' (os.listdir puis un appel système par entrée, à chaque appel) ;
+- 'PortraitIndex.listing()' (contenu en cache, revérifié par la date de modification du dossier).
+
+Mesure aussi la construction complète de l'index et la recherche dans tous les dossiers.
+
+Usage :
+    python benchmarks/bench_portrait_index.py
+"""
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+warnings.filterwarnings('ignore')
+
+from app.portrait_utils import PortraitIndex, get_portraits_and_folders, _RACY_WINDOW_NS
+
+FOLDERS = 20
+SUBFOLDERS = 5
+IMAGES_PER_FOLDER = 50
+REPEAT = 20
+
+def build_tree(base_dir):
+    """Crée FOLDERS dossiers de SUBFOLDERS sous-dossiers, chacun avec IMAGES_PER_FOLDER images vides."""
+    folders = ['']
+    for i in range(FOLDERS):
+        folder = f"Dossier {i:02d}"
+        folders.append(folder)
+        for j in range(SUBFOLDERS):
+            folders.append(f"{folder}/Sous-dossier {j}")
+    for folder in folders:
+        os.makedirs(os.path.join(base_dir, folder), exist_ok=True)
+        for k in range(IMAGES_PER_FOLDER):
+            open(os.path.join(base_dir, folder, f"portrait-{k:03d}.jpg"), 'wb').close()
+    # Vieillit les dates de modification : un dossier modifié à l'instant serait relu à chaque fois.
+    old = time.time_ns() - 2 * _RACY_WINDOW_NS
+    for folder in folders:
+        os.utime(os.path.join(base_dir, folder), ns=(old, old))
+    return folders
+
+def timed(function, repeat=REPEAT):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat * 1000
+
+def main():
+    base_dir = tempfile.mkdtemp()
+    folders = build_tree(base_dir)
+    print(f"{len(folders)} dossiers, {len(folders) * IMAGES_PER_FOLDER} portraits")
+
+    index = PortraitIndex(base_dir)
+    build = timed(index.refresh, repeat=1)
+    print(f"Construction complète de l'index : {build:.2f} ms")
+
+    def list_all_direct():
+        for folder in folders:
+            get_portraits_and_folders(base_dir, folder)
+
+    def list_all_indexed():
+        for folder in folders:
+            index.listing(folder)
+
+    direct = timed(list_all_direct) / len(folders)
+    indexed = timed(list_all_indexed) / len(folders)
+    print(f"Listage d'un dossier : get_portraits_and_folders {direct:.3f} ms | index {indexed:.3f} ms "
+          f"(x{direct / indexed:.1f})")
+    print(f"Recherche dans tous les dossiers : {timed(lambda: index.search('portrait-042')):.2f} ms")
+
+if __name__ == '__main__':
+    main()
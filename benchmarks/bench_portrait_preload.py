@@ -0,0 +1,118 @@
+"""
+Benchmark du délai entre un changement de tour et l'affichage du portrait dans la vue portrait.
+
+Simule le chemin critique du client de la vue portrait à chaque 'Tour Suivant' :
+- sans préchargement : réception du delta, puis téléchargement de la variante 'display' du portrait
+  du nouveau participant actif, puis décodage de l'image (au premier tour de chaque participant,
+  l'image n'est pas encore dans le cache du navigateur ; aux tours suivants, seul le décodage reste) ;
+- avec préchargement ('upcoming') : réception du delta, l'image du nouveau participant actif ayant
+  été téléchargée et décodée pendant le tour précédent.
+
+Le téléchargement passe par le client de test Flask (sans réseau) et le décodage par Pillow :
+les mesures donnent l'ordre de grandeur du travail retiré du chemin critique, pas le temps
+d'affichage réel d'un navigateur (mesurable dans la vue portrait avec la mesure
+'portrait-turn-to-paint' de l'onglet Performance).
+
+Usage :
+    python benchmarks/bench_portrait_preload.py
+"""
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+import warnings
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+warnings.filterwarnings('ignore')
+os.environ.setdefault('WEBTRACKER_JOURNAL_DIR', '')
+
+from PIL import Image
+from app import app, socketio, models, routes
+from app.assets import PORTRAIT_DIR
+
+TABLE_ID = 'bench-preload'
+ROUNDS = 3
+
+def portraits():
+    """Liste des portraits fournis (chemins relatifs au dossier des portraits)."""
+    found = []
+    for root, _, files in os.walk(PORTRAIT_DIR):
+        for name in files:
+            found.append(os.path.relpath(os.path.join(root, name), PORTRAIT_DIR).replace(os.sep, '/'))
+    return sorted(found)
+
+def fetch_and_decode(client, url):
+    """Télécharge une image et la décode entièrement, comme le ferait le navigateur avant l'affichage."""
+    data = client.get(url).data
+    with Image.open(io.BytesIO(data)) as image:
+        image.load()
+
+def next_turn(client, socket_client):
+    """Passe au tour suivant et retourne le delta reçu par le client Socket.IO."""
+    client.post(f"/t/{TABLE_ID}/next")
+    events = [e for e in socket_client.get_received() if e['name'] == 'state_delta']
+    return events[-1]['args'][0]
+
+def ms(values):
+    return f"médiane {statistics.median(values) * 1000:7.2f} ms | max {max(values) * 1000:7.2f} ms"
+
+def main():
+    routes.PORTRAIT_CACHE_DIR = tempfile.mkdtemp() # Variantes recalculées : premier affichage à froid.
+    table = models.get_table(TABLE_ID)
+    for index, portrait in enumerate(portraits()):
+        table.add_participants([models.Participant(f"P{index:02d}", 'Ennemi', 'Principal', False,
+                                                   initiative_roll=index, portrait=portrait)])
+    table.update_state(changed=table.initiative_data)
+    count = len(table.initiative_data)
+    print(f"{count} participants avec portrait, {ROUNDS} rounds, préchargement de "
+          f"{app.config['PORTRAIT_LOOKAHEAD']} participants")
+
+    client = app.test_client()
+    socket_client = socketio.test_client(app)
+    socket_client.emit('join_table', {'table': TABLE_ID})
+    snapshot = client.get(f"/t/{TABLE_ID}/api/state").get_json()['snapshot']
+    participants = {p['id']: p for p in snapshot['participants']}
+    order = [p['id'] for p in snapshot['participants']]
+
+    # Sans préchargement : le téléchargement et le décodage suivent la réception du delta.
+    cold, warm = [], []
+    seen = set()
+    for _ in range(ROUNDS * count):
+        start = time.perf_counter()
+        delta = next_turn(client, socket_client)
+        url = participants[order[delta['turn']]]['portrait_url']
+        fetch_and_decode(client, url)
+        (warm if url in seen else cold).append(time.perf_counter() - start)
+        seen.add(url)
+
+    # Avec préchargement : les portraits des prochains participants sont décodés pendant le tour
+    # en cours ; le changement de tour n'attend plus que le delta.
+    routes.PORTRAIT_CACHE_DIR = tempfile.mkdtemp()
+    preloaded, background = [], []
+    decoded = set()
+    upcoming = client.get(f"/t/{TABLE_ID}/api/state").get_json()['snapshot']['upcoming']
+    for _ in range(ROUNDS * count):
+        start = time.perf_counter()
+        for participant_id in upcoming:
+            url = participants[participant_id]['portrait_url']
+            if url not in decoded:
+                fetch_and_decode(client, url)
+                decoded.add(url)
+        background.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        delta = next_turn(client, socket_client)
+        if participants[order[delta['turn']]]['portrait_url'] not in decoded:
+            raise AssertionError("Le portrait du nouveau participant actif n'a pas été préchargé.")
+        preloaded.append(time.perf_counter() - start)
+        upcoming = delta['upcoming']
+
+    print(f"Sans préchargement, premier affichage : {ms(cold)}")
+    print(f"Sans préchargement, image en cache    : {ms(warm)}")
+    print(f"Avec préchargement                    : {ms(preloaded)}")
+    print(f"Préchargement (hors chemin critique)  : {ms(background)}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark de l'arrivée d'une horde de sbires.
+
+Ajoute SPAWN_COUNT 'Extra' à une table qui contient déjà EXISTING participants, et compare :
+- l'ancien comportement, un participant à la fois (ajout en fin de liste puis tri complet) ;
+- 'Tracker.add_participants()' appelé pour chaque participant (insertion à sa place) ;
+- 'Tracker.add_participants()' avec toute la horde (tri de la horde puis fusion en un passage) ;
+- la requête '/spawn' complète (création, tirages, fusion et diffusion d'un seul delta),
+  sans puis avec un client Socket.IO connecté à la table, comparée à SPAWN_COUNT requêtes '/add'.
+
+Usage :
+    python benchmarks/bench_spawn.py
+"""
+import os
+import random
+import sys
+import time
+import warnings
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+warnings.filterwarnings('ignore')
+os.environ.setdefault('WEBTRACKER_JOURNAL_DIR', '')
+
+from app import app, socketio, models
+from app.models import Participant, Tracker
+
+EXISTING = 50
+SPAWN_COUNT = 500
+REPEAT = 5
+FRAME_BUDGET_MS = 16.7
+
+def existing_participants():
+    return [Participant(f"PJ {i}", 'player', 'Joker', True, initiative_roll=random.randint(1, 20))
+            for i in range(EXISTING)]
+
+def horde():
+    return [Participant(f"Gobelin {i}", 'monster', 'Extra', False, initiative_roll=random.randint(1, 20))
+            for i in range(1, SPAWN_COUNT + 1)]
+
+def timed(setup, function, repeat=REPEAT):
+    """Durée moyenne (en ms) de 'function(*setup())', préparation exclue."""
+    total = 0
+    for _ in range(repeat):
+        args = setup()
+        start = time.perf_counter()
+        function(*args)
+        total += time.perf_counter() - start
+    return total / repeat * 1000
+
+def new_table():
+    table = Tracker('bench')
+    table.set_participants(existing_participants())
+    return table, horde()
+
+def append_and_sort(table, spawned):
+    for p in spawned:
+        table.initiative_data.append(p)
+        table.initiative_data.sort(key=lambda x: (x.initiative_roll, x.name), reverse=True)
+
+def insert_each(table, spawned):
+    for p in spawned:
+        table.add_participants([p])
+
+def merge_all(table, spawned):
+    table.add_participants(spawned)
+
+def main():
+    print(f"{SPAWN_COUNT} Extra ajoutés à une table de {EXISTING} participants")
+    print(f"Un à un, ajout puis tri complet  : {timed(new_table, append_and_sort):8.2f} ms")
+    print(f"Un à un, insertion à sa place    : {timed(new_table, insert_each):8.2f} ms")
+    print(f"Toute la horde, fusion           : {timed(new_table, merge_all):8.2f} ms")
+
+    client = app.test_client()
+    socket_client = socketio.test_client(app)
+    form = {'name': 'Gobelin', 'is_player': 'monster', 'type': 'Extra', 'count': str(SPAWN_COUNT)}
+
+    def reset_table(table_id):
+        def setup():
+            models.get_table(table_id).set_participants(existing_participants())
+            return ()
+        return setup
+
+    client.post('/t/bench-spawn/spawn', data=form) # Première requête : initialisation de Flask, non mesurée.
+    spawn_ms = timed(reset_table('bench-spawn'), lambda: client.post('/t/bench-spawn/spawn', data=form))
+    print(f"Requête /spawn                   : {spawn_ms:8.2f} ms (budget d'une image : {FRAME_BUDGET_MS} ms)")
+
+    # Avec un client connecté à la table, l'encodage du paquet Socket.IO et son décodage
+    # par le client de test (dans ce même processus) s'ajoutent au traitement de la requête.
+    socket_client.emit('join_table', {'table': 'bench-spawn'})
+    listened_ms = timed(reset_table('bench-spawn'), lambda: client.post('/t/bench-spawn/spawn', data=form))
+    deltas = [e for e in socket_client.get_received() if e['name'] == 'state_delta']
+    print(f"Requête /spawn, client connecté  : {listened_ms:8.2f} ms ({len(deltas) // REPEAT} delta par appel)")
+
+    def add_each():
+        for i in range(SPAWN_COUNT):
+            client.post('/t/bench-add/add', data={'name': f"Gobelin {i}", 'is_player': 'monster', 'type': 'Extra'})
+    add_ms = timed(reset_table('bench-add'), add_each, repeat=1)
+    print(f"{SPAWN_COUNT} requêtes /add                : {add_ms:8.2f} ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""
+Benchmark du passage au tour suivant dans les grandes batailles.
+
+Pour des tables de tailles croissantes dont la plupart des Extra sont hors combat, compare :
+- l'ancien parcours de la liste ('_turn_order_after()' : les participants 'Mort' sont passés
+  un à un jusqu'au prochain participant valide) ;
+- l'anneau des tours de 'Tracker' ('_next_actor'), qui donne directement le participant suivant.
+Sont mesurés un round complet de 'Tour Suivant' (avec les prochains participants 'upcoming' de
+chaque delta) et l'entretien de l'anneau quand un participant tombe puis est soigné.
+
+Avant les mesures, l'ordre des tours donné par l'anneau est comparé à celui de l'ancien parcours.
+
+Usage :
+    python benchmarks/bench_turns.py
+"""
+import gc
+import os
+import random
+import sys
+import time
+import warnings
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+warnings.filterwarnings('ignore')
+os.environ.setdefault('WEBTRACKER_JOURNAL_DIR', '')
+
+from app import app
+from app.models import Participant, Tracker
+
+SIZES = [100, 1000, 10000, 50000]
+DEAD_RATIO = 0.9
+LOOKAHEAD = 3
+REPEAT = 3
+
+def battle(count, seed=0):
+    """Une bataille de 'count' participants : 2 % de joueurs, les autres des Extra, dont DEAD_RATIO hors combat."""
+    rng = random.Random(seed)
+    table = Tracker('bench')
+    table.update_state = lambda changed=None, removed=None: [table._refresh_turn(p) for p in changed or ()]
+    table.set_participants([
+        Participant(f"Combattant {i}", 'monster', 'Joker' if i % 50 == 0 else 'Extra', i % 50 == 0,
+                    initiative_roll=rng.randint(1, 20),
+                    wounds=1 if i % 50 and rng.random() < DEAD_RATIO else 0)
+        for i in range(count)])
+    table.current_turn_index = 0
+    return table
+
+def old_turn_order_after(table, index):
+    """Ancien parcours : positions des participants valides après 'index', en boucle."""
+    count = len(table.initiative_data)
+    for offset in range(1, count + 1):
+        position = (index + offset) % count
+        if table.initiative_data[position].status['class'] != 'status-dead':
+            yield position
+
+def old_round(table):
+    """Un round de 'Tour Suivant' avec l'ancien parcours, 'upcoming' compris."""
+    alive = sum(1 for p in table.initiative_data if p.status['class'] != 'status-dead')
+    for _ in range(alive):
+        table.current_turn_index = next(old_turn_order_after(table, table.current_turn_index))
+        upcoming = []
+        for position in old_turn_order_after(table, table.current_turn_index):
+            if position == table.current_turn_index or len(upcoming) == LOOKAHEAD:
+                break
+            upcoming.append(table.initiative_data[position].id)
+
+def new_round(table):
+    """Un round de 'Tour Suivant' avec l'anneau des tours, 'upcoming' compris."""
+    for _ in range(len(table._next_actor)):
+        table.next_turn()
+        table.upcoming_ids(LOOKAHEAD)
+
+def fall_and_heal(table):
+    """Chaque participant valide tombe puis est soigné (mise à jour de l'anneau)."""
+    for p in [p for p in table.initiative_data if p.status['class'] != 'status-dead' and p.p_type == 'Extra']:
+        p.add_wound()
+        table.update_state(changed=[p])
+        p.remove_wound()
+        table.update_state(changed=[p])
+
+def check_order(table):
+    """Vérifie que l'anneau donne le même ordre des tours que l'ancien parcours."""
+    index = table.current_turn_index
+    for _ in range(len(table._next_actor) + 1):
+        expected = next(old_turn_order_after(table, index))
+        assert table.next_turn_index() == expected, "Ordre des tours différent de l'ancien parcours"
+        assert table.upcoming_ids(LOOKAHEAD) == [
+            table.initiative_data[p].id for p in old_turn_order_after(table, index) if p != index][:LOOKAHEAD]
+        table.next_turn()
+        index = table.current_turn_index
+
+def timed(count, function):
+    """Meilleure durée (en ms) de 'function' sur une nouvelle bataille."""
+    best = float('inf')
+    for _ in range(REPEAT):
+        table = battle(count)
+        gc.collect()
+        gc.disable()
+        start = time.perf_counter()
+        function(table)
+        best = min(best, time.perf_counter() - start)
+        gc.enable()
+    return best * 1000
+
+def main():
+    with app.app_context():
+        check_order(battle(1000))
+        print(f"{int(DEAD_RATIO * 100)} % des Extra hors combat, {LOOKAHEAD} prochains participants par delta")
+        print(f"{'participants':>12} | {'valides':>8} | {'round, ancien parcours':>22} | {'round, anneau':>14} | {'tomber et soigner':>17}")
+        for count in SIZES:
+            alive = len(battle(count)._next_actor)
+            old = timed(count, old_round)
+            new = timed(count, new_round)
+            maintenance = timed(count, fall_and_heal)
+            print(f"{count:>12} | {alive:>8} | {old:19.2f} ms | {new:11.2f} ms | {maintenance:14.2f} ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""
+Benchmark de l'historique d'annulation sur une grande table.
+
+Sur une table de TABLE_SIZE participants, enchaîne OPERATIONS mutations courantes du MJ
+(blessure, soin, statut, suppression, ajout, tour suivant) et mesure :
+- la mémoire occupée par l'historique ('undo_history') au fil des mutations : elle doit cesser
+  de croître une fois UNDO_HISTORY_SIZE mutations enregistrées (la mesure est un majorant :
+  les états partagés entre l'historique et la table sont comptés avec l'historique) ;
+- la durée moyenne d'une mutation avec son enregistrement ('commit_step()'), d'une annulation
+  et d'un rétablissement ;
+et les compare à une annulation naïve qui copie toute la liste ('copy.deepcopy(initiative_data)')
+à chaque mutation.
+
+Usage :
+    python benchmarks/bench_undo.py
+"""
+import copy
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+import warnings
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+warnings.filterwarnings('ignore')
+os.environ.setdefault('WEBTRACKER_JOURNAL_DIR', '')
+
+from app import app, models
+from app.models import Participant, Tracker
+
+TABLE_SIZE = 5000
+OPERATIONS = 5000
+# Mesure de la mémoire toutes les CHECKPOINT mutations.
+CHECKPOINT = 500
+# La copie naïve est mesurée sur moins de mutations (et sans borne) : elle est trop lente.
+NAIVE_OPERATIONS = 50
+
+def battle(count, seed=0):
+    """Une table de 'count' participants, dont 2 % de joueurs."""
+    rng = random.Random(seed)
+    table = Tracker('bench')
+    # Pas de diffusion : seul l'état de la table est mesuré.
+    table.flush_state = lambda: None
+    participants = [Participant(f"Combattant {i}", 'monster', 'Joker' if i % 5 == 0 else 'Extra', i % 50 == 0,
+                                initiative_roll=rng.randint(1, 20)) for i in range(count)]
+    table.set_participants(participants)
+    table.update_state(changed=participants)
+    table.undo_history.clear()
+    return table
+
+def mutate(table, rng, i):
+    """Une mutation du MJ, choisie au hasard, signalée comme le font les routes."""
+    operation = rng.random()
+    p = table.get_participant_at(rng.randrange(len(table.initiative_data)))
+    if operation < 0.35:
+        p.add_wound()
+        table.update_state(changed=[p])
+    elif operation < 0.5:
+        p.remove_wound()
+        table.update_state(changed=[p])
+    elif operation < 0.65:
+        p.add_status('Secoué', 2)
+        table.update_state(changed=[p])
+    elif operation < 0.75:
+        table.remove_participant(p)
+        table.update_state(removed=[p])
+    elif operation < 0.85:
+        added = Participant(f"Renfort {i}", 'monster', 'Extra', False, initiative_roll=rng.randint(1, 20))
+        table.add_participants([added])
+        table.update_state(changed=[added])
+    else:
+        table.next_turn()
+
+def history_size(table):
+    """Mémoire (en Mo) de l'historique, mesurée en reconstruisant ses étapes avec 'tracemalloc'."""
+    gc.collect()
+    tracemalloc.start()
+    steps = copy.deepcopy(list(table.undo_history))
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del steps
+    return size / 1024 / 1024
+
+def main():
+    rng = random.Random(1)
+    with app.app_context():
+        table = battle(TABLE_SIZE)
+        print(f"{TABLE_SIZE} participants, {OPERATIONS} mutations, historique borné à {models.UNDO_HISTORY_SIZE} étapes")
+        print(f"{'mutations':>10} | {'étapes':>7} | {'historique':>11}")
+        elapsed = 0.0
+        for i in range(1, OPERATIONS + 1):
+            start = time.perf_counter()
+            mutate(table, rng, i)
+            elapsed += time.perf_counter() - start
+            if i % CHECKPOINT == 0:
+                print(f"{i:>10} | {len(table.undo_history):>7} | {history_size(table):8.2f} Mo")
+
+        start = time.perf_counter()
+        undone = 0
+        while table.undo():
+            undone += 1
+        undo_time = time.perf_counter() - start
+        start = time.perf_counter()
+        while table.redo():
+            pass
+        redo_time = time.perf_counter() - start
+
+        # Annulation naïve : une copie complète de la liste avant chaque mutation.
+        naive_table, naive_rng, snapshots = battle(TABLE_SIZE), random.Random(1), []
+        naive_table.commit_step = lambda: None
+        gc.collect()
+        tracemalloc.start()
+        start = time.perf_counter()
+        for i in range(NAIVE_OPERATIONS):
+            snapshots.append(copy.deepcopy(naive_table.initiative_data))
+            mutate(naive_table, naive_rng, i)
+        naive_time = time.perf_counter() - start
+        naive_size = tracemalloc.get_traced_memory()[0] / 1024 / 1024
+        tracemalloc.stop()
+
+    print(f"{'':>28} | {'historique':>12} | {'copie complète':>14}")
+    print(f"{'mutation enregistrée':>28} | {elapsed / OPERATIONS * 1e3:9.3f} ms | {naive_time / NAIVE_OPERATIONS * 1e3:11.3f} ms")
+    print(f"{'mémoire par étape':>28} | {history_size(table) / len(table.undo_history) * 1024:9.2f} ko | "
+          f"{naive_size / NAIVE_OPERATIONS * 1024:11.0f} ko")
+    print(f"{'annulation':>28} | {undo_time / undone * 1e3:9.3f} ms |")
+    print(f"{'rétablissement':>28} | {redo_time / undone * 1e3:9.3f} ms |")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,328 @@
+"""
+Test de charge de bout en bout avec des écrans de table simulés.
+
+Démarre le serveur (Flask-SocketIO avec eventlet, comme 'run.py') dans ce processus, puis connecte
+à chaque table des écrans simulés qui se comportent comme les pages du navigateur :
+- vue MJ ('index.html') : applique les deltas 'state_delta' et, si des participants ont été ajoutés,
+  modifiés ou retirés, recharge la table partielle '/api/main_content' (avec son ETag) ;
+- vue joueur ('view.html') et vue portrait ('portrait_view.html') : appliquent les deltas à leur
+  miroir local, sans autre requête.
+Comme 'TrackerMirror' ('state_sync.js'), un écran qui détecte un trou dans les révisions
+redemande les deltas manquants ou un instantané complet à '/api/state'.
+
+Un MJ scripté par table enchaîne des mutations ('/add', '+ Blessure', '/next', '/new_round').
+Le test mesure :
+- le débit de mutations (mutations par seconde, toutes tables confondues) ;
+- la latence entre l'envoi d'une mutation et la mise à jour de tous les écrans de sa table (p50, p99) ;
+- le nombre de rendus de vues partielles par mutation ;
+- les octets reçus par les écrans par mutation, tels qu'ils circulent sur le réseau : trames
+  WebSocket (compressées par 'permessage-deflate' si l'extension est négociée) et réponses HTTP
+  (en-têtes compris, corps compressés si le serveur les compresse).
+Comme un navigateur, chaque écran propose la compression (Accept-Encoding, permessage-deflate) ;
+'--no-compression' la désactive côté écrans, pour comparer.
+
+Les écrans simulés tournent dans le même processus (et la même boucle eventlet) que le serveur :
+leur propre travail s'ajoute aux latences mesurées, qui sont donc des majorants.
+
+Usage :
+    python benchmarks/load_tables.py --tables 2 --players 10 --portraits 10 --mutations 200 [--no-compression]
+"""
+import warnings
+warnings.filterwarnings('ignore')
+import eventlet
+eventlet.monkey_patch()
+
+import argparse
+import gzip
+import json
+import os
+import random
+import socket
+import sys
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+os.environ.setdefault('WEBTRACKER_JOURNAL_DIR', '')
+
+import simple_websocket
+from wsproto.events import AcceptConnection, Request
+from wsproto.extensions import PerMessageDeflate
+from app import app, socketio, models, render_cache, compression
+
+# Répartition des mutations du MJ scripté.
+MUTATIONS = [('next', 0.5), ('add_wound', 0.25), ('add', 0.2), ('new_round', 0.05)]
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+class CountingSocket:
+    """Socket qui compte les octets reçus."""
+    def __init__(self, sock):
+        self.sock = sock
+        self.received = 0
+
+    def recv(self, size, *args):
+        data = self.sock.recv(size, *args)
+        self.received += len(data)
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self.sock, name)
+
+
+class WebSocketClient(simple_websocket.Client):
+    """
+    Client WebSocket qui compte les octets reçus sur le réseau et, comme un navigateur,
+    propose l'extension 'permessage-deflate' (si 'deflate').
+    """
+    deflate = True
+
+    def handshake(self):
+        self.sock = CountingSocket(self.sock)
+        extensions = [PerMessageDeflate()] if self.deflate else []
+        self.sock.send(self.ws.send(Request(host=self.host, target=self.path, extensions=extensions)))
+        event = None
+        while event is None:
+            self.ws.receive_data(self.sock.recv(self.receive_bytes))
+            event = next(self.ws.events(), None)
+        if not isinstance(event, AcceptConnection):
+            raise ConnectionError(getattr(event, 'status_code', 400))
+        self.extensions = [extension.name for extension in event.extensions]
+        self.connected = True
+
+
+class Screen:
+    """
+    Écran de table simulé : une connexion Socket.IO (protocole Engine.IO 4 sur WebSocket)
+    et un miroir de l'état de la table, mis à jour comme le fait 'TrackerMirror'.
+    """
+    def __init__(self, kind, base, table_id):
+        self.kind = kind
+        self.base = f"{base}/t/{table_id}"
+        self.table_id = table_id
+        self.rev = None
+        self.participants = {}
+        self.order = []
+        self.etag = None
+        # Date de mise à jour de l'écran pour chaque révision de l'état.
+        self.updated_at = {}
+        self.http_bytes = 0
+        self.ws = WebSocketClient.connect(f"ws://{base.split('://', 1)[1]}/socket.io/?EIO=4&transport=websocket")
+        self._receive() # Paquet d'ouverture Engine.IO.
+        self.ws.send('40')
+        self._receive() # Connexion Socket.IO acceptée.
+        self.ws.send('42' + json.dumps(['join_table', {'table': table_id}]))
+        self.sync()
+        self.listener = eventlet.spawn(self.listen)
+
+    @property
+    def ws_bytes(self):
+        return self.ws.sock.received
+
+    def _receive(self):
+        return self.ws.receive()
+
+    def _get(self, path, headers=None):
+        headers = dict(headers or {})
+        if WebSocketClient.deflate:
+            headers['Accept-Encoding'] = 'gzip'
+        try:
+            with urllib.request.urlopen(urllib.request.Request(self.base + path, headers=headers), timeout=30) as r:
+                body = r.read()
+                self.http_bytes += len(body) + len(str(r.headers))
+                if r.headers.get('Content-Encoding') == 'gzip':
+                    body = gzip.decompress(body)
+                return r, body
+        except urllib.error.HTTPError as error:
+            self.http_bytes += len(str(error.headers))
+            raise
+
+    def listen(self):
+        try:
+            while True:
+                message = self._receive()
+                if message == '2':
+                    self.ws.send('3') # Réponse au ping Engine.IO.
+                elif message.startswith('42'):
+                    name, payload = json.loads(message[2:])
+                    if name == 'state_delta':
+                        self.receive(payload)
+        except simple_websocket.ConnectionClosed:
+            pass
+
+    def receive(self, delta):
+        if self.rev is not None and delta['rev'] <= self.rev:
+            return
+        if delta['base'] != self.rev:
+            self.sync()
+            return
+        self.apply(delta)
+        if self.kind == 'gm' and ('upsert' in delta or 'remove' in delta):
+            self.refresh_main_content()
+        self.mark_updated()
+
+    def apply(self, delta):
+        for participant_id in delta.get('remove', ()):
+            self.participants.pop(participant_id, None)
+        for p in delta.get('upsert', ()):
+            self.participants[p['id']] = p
+        if 'order' in delta:
+            self.order = delta['order']
+        self.rev = delta['rev']
+
+    def sync(self):
+        """Rattrape l'état du serveur depuis la révision locale (ou charge un instantané complet)."""
+        query = '' if self.rev is None else f"?since={self.rev}"
+        data = json.loads(self._get(f"/api/state{query}")[1])
+        if 'snapshot' in data:
+            self.participants = {p['id']: p for p in data['snapshot']['participants']}
+            self.order = [p['id'] for p in data['snapshot']['participants']]
+            self.rev = data['snapshot']['rev']
+        else:
+            for delta in data['deltas']:
+                self.apply(delta)
+        if self.kind == 'gm':
+            self.refresh_main_content()
+        self.mark_updated()
+
+    def refresh_main_content(self):
+        headers = {'If-None-Match': self.etag} if self.etag else {}
+        try:
+            response, _ = self._get('/api/main_content', headers)
+            self.etag = response.headers.get('ETag')
+        except urllib.error.HTTPError as error:
+            if error.code != 304:
+                raise
+
+    def mark_updated(self):
+        now = time.perf_counter()
+        if self.rev is not None:
+            self.updated_at.setdefault(self.rev, now)
+
+    def updated(self, rev):
+        """Date à laquelle l'écran a atteint la révision 'rev' (ou une révision ultérieure), ou None."""
+        reached = [t for r, t in self.updated_at.items() if r >= rev]
+        return min(reached) if reached else None
+
+    def close(self):
+        self.ws.close()
+        self.listener.kill()
+
+
+def post(url, data=None):
+    body = urllib.parse.urlencode(data or {}).encode()
+    with urllib.request.urlopen(urllib.request.Request(url, data=body, method='POST'), timeout=30) as r:
+        return r.read()
+
+def game_master(base, table_id, count, rate, rng, sent):
+    """MJ scripté : enchaîne 'count' mutations sur sa table et note (révision, date d'envoi) de chacune."""
+    table = models.get_table(table_id)
+    operations, weights = zip(*MUTATIONS)
+    for i in range(count):
+        operation = rng.choices(operations, weights)[0]
+        start = time.perf_counter()
+        if operation == 'add':
+            post(f"{base}/t/{table_id}/add", {'name': f"Renfort {i}", 'is_player': 'monster', 'type': 'Extra'})
+        elif operation == 'add_wound':
+            participant = rng.choice(table.initiative_data)
+            post(f"{base}/t/{table_id}/participants/{participant.id}/add_wound")
+        else:
+            post(f"{base}/t/{table_id}/{operation}")
+        sent.append((table.state_revision, start))
+        if rate:
+            eventlet.sleep(max(0, 1 / rate - (time.perf_counter() - start)))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tables', type=int, default=2)
+    parser.add_argument('--gm', type=int, default=1, help="Écrans MJ par table")
+    parser.add_argument('--players', type=int, default=10, help="Écrans de vue joueur par table")
+    parser.add_argument('--portraits', type=int, default=10, help="Écrans de vue portrait par table")
+    parser.add_argument('--participants', type=int, default=30, help="Participants de chaque table au départ")
+    parser.add_argument('--mutations', type=int, default=200, help="Mutations par table")
+    parser.add_argument('--rate', type=float, default=0, help="Mutations par seconde et par table (0 : au plus vite)")
+    parser.add_argument('--no-compression', action='store_true',
+                        help="Les écrans ne proposent ni compression HTTP ni 'permessage-deflate'")
+    args = parser.parse_args()
+    WebSocketClient.deflate = not args.no_compression
+
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    eventlet.spawn(socketio.run, app, host='127.0.0.1', port=port, log_output=False)
+    for _ in range(100):
+        try:
+            urllib.request.urlopen(f"{base}/api/state", timeout=1).read()
+            break
+        except OSError:
+            eventlet.sleep(0.1)
+
+    tables = [f"load{i}" for i in range(args.tables)]
+    for table_id in tables:
+        post(f"{base}/t/{table_id}/reset")
+        for i in range(args.participants):
+            post(f"{base}/t/{table_id}/add", {'name': f"Extra {i}", 'is_player': 'monster', 'type': 'Extra'})
+    kinds = ['gm'] * args.gm + ['player'] * args.players + ['portrait'] * args.portraits
+    screens = {table_id: [Screen(kind, base, table_id) for kind in kinds] for table_id in tables}
+    print(f"{args.tables} tables | {len(kinds)} écrans par table ({args.gm} MJ, {args.players} joueur, "
+          f"{args.portraits} portrait) | {args.participants} participants au départ | "
+          f"{args.mutations} mutations par table")
+    extensions = screens[tables[0]][0].ws.extensions
+    print(f"Compression                    : HTTP {'gzip' if WebSocketClient.deflate else 'non'} | "
+          f"WebSocket {', '.join(extensions) if extensions else 'non'}")
+
+    ws_before = sum(s.ws_bytes for table_screens in screens.values() for s in table_screens)
+    http_before = sum(s.http_bytes for table_screens in screens.values() for s in table_screens)
+    renders_before = render_cache.stats['renders']
+    compressions_before = compression.stats['compressed'] - compression.stats['cache_hits']
+    sent = {table_id: [] for table_id in tables}
+    start = time.perf_counter()
+    masters = [eventlet.spawn(game_master, base, table_id, args.mutations, args.rate, random.Random(i), sent[table_id])
+               for i, table_id in enumerate(tables)]
+    for master in masters:
+        master.wait()
+    elapsed = time.perf_counter() - start
+
+    # Attend que tous les écrans aient reçu la dernière révision de leur table.
+    deadline = time.time() + 30
+    while time.time() < deadline and any(
+            s.updated(sent[table_id][-1][0]) is None for table_id in tables for s in screens[table_id]):
+        eventlet.sleep(0.05)
+
+    latencies = []
+    for table_id in tables:
+        for rev, sent_at in sent[table_id]:
+            updated = [s.updated(rev) for s in screens[table_id]]
+            if None not in updated:
+                latencies.append(max(updated) - sent_at)
+    mutations = args.tables * args.mutations
+    ws_bytes = sum(s.ws_bytes for table_screens in screens.values() for s in table_screens) - ws_before
+    http_bytes = sum(s.http_bytes for table_screens in screens.values() for s in table_screens) - http_before
+    renders = render_cache.stats['renders'] - renders_before
+    compressions = compression.stats['compressed'] - compression.stats['cache_hits'] - compressions_before
+    for table_screens in screens.values():
+        for s in table_screens:
+            s.close()
+
+    print(f"Débit                          : {mutations / elapsed:8.1f} mutations/s")
+    if latencies:
+        print(f"Latence mutation -> écrans     : p50 {percentile(latencies, 0.5) * 1000:7.1f} ms | "
+              f"p99 {percentile(latencies, 0.99) * 1000:7.1f} ms | max {max(latencies) * 1000:7.1f} ms")
+    if len(latencies) < mutations:
+        print(f"Mutations jamais reçues par tous les écrans : {mutations - len(latencies)}")
+    print(f"Rendus de vues partielles      : {renders / mutations:8.2f} par mutation")
+    print(f"Compressions de réponses       : {compressions / mutations:8.2f} par mutation")
+    print(f"Octets reçus par les écrans    : {(ws_bytes + http_bytes) / mutations:8.0f} par mutation "
+          f"(WebSocket {ws_bytes / mutations:.0f}, HTTP {http_bytes / mutations:.0f}, sur le réseau)")
+
+if __name__ == '__main__':
+    main()
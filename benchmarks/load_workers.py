@@ -0,0 +1,138 @@
+"""
+Test de charge multi-processus avec l'état partagé dans Redis.
+
+Lance N processus serveur partageant le même stockage d'état Redis (et la même file de
+messages SocketIO), répartit les requêtes de clients simulés entre eux, et mesure le débit
+(requêtes par seconde) pour chaque nombre de processus.
+
+La charge mélange des lectures (rafraîchissement de la vue MJ, synchronisation de l'état) et
+des mutations ('Tour Suivant', blessures) sur plusieurs tables : les mutations d'une même table
+sont sérialisées par son verrou, les lectures et les autres tables se répartissent entre processus.
+
+Sans '--redis', un serveur compatible Redis est démarré localement avec fakeredis
+('pip install fakeredis lupa') ; les mesures sont alors plus significatives avec un vrai
+redis-server ('--redis redis://127.0.0.1:6379/15') : fakeredis tourne dans ce même processus,
+partage le GIL avec les clients simulés et devient vite le goulot d'étranglement.
+
+Usage :
+    python benchmarks/load_workers.py --workers 1 2 4 --clients 32 --duration 10
+"""
+import argparse
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+import urllib.request
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# Lance un processus serveur sur le port donné en argument.
+WORKER_SCRIPT = """
+import sys, eventlet
+eventlet.monkey_patch()
+import warnings; warnings.filterwarnings('ignore')
+from app import app, socketio
+socketio.run(app, host='127.0.0.1', port=int(sys.argv[1]), log_output=False)
+"""
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def start_fake_redis():
+    """Démarre un serveur fakeredis TCP dans un thread et retourne son URL."""
+    from fakeredis import TcpFakeServer
+    port = free_port()
+    server = TcpFakeServer(('127.0.0.1', port), server_type='redis')
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"redis://127.0.0.1:{port}/0"
+
+def wait_for(url, timeout=20):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=1).read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Le serveur {url} ne répond pas")
+
+def post(url, data=None):
+    body = urllib.parse.urlencode(data or {}).encode()
+    return urllib.request.urlopen(urllib.request.Request(url, data=body, method='POST'), timeout=10).read()
+
+def run_load(bases, tables, clients, duration):
+    """Exécute la charge pendant 'duration' secondes et retourne (requêtes, erreurs)."""
+    counts = [0] * clients
+    errors = [0] * clients
+    stop = time.time() + duration
+
+    def client(i):
+        rng = random.Random(i)
+        while time.time() < stop:
+            base = bases[rng.randrange(len(bases))]
+            table = f"{base}/t/{tables[rng.randrange(len(tables))]}"
+            roll = rng.random()
+            try:
+                if roll < 0.6:
+                    urllib.request.urlopen(f"{table}/api/main_content", timeout=10).read()
+                elif roll < 0.8:
+                    urllib.request.urlopen(f"{table}/api/state", timeout=10).read()
+                elif roll < 0.9:
+                    post(f"{table}/next")
+                else:
+                    post(f"{table}/add_wound/{rng.randrange(20)}")
+                counts[i] += 1
+            except OSError:
+                errors[i] += 1
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return sum(counts), sum(errors)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--tables', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--redis', help="URL du serveur Redis (par défaut : fakeredis local)")
+    args = parser.parse_args()
+
+    redis_url = args.redis or start_fake_redis()
+    tables = [f"bench{i}" for i in range(args.tables)]
+    print(f"Redis : {redis_url} | {args.clients} clients | {args.tables} tables | {args.duration} s par mesure")
+    print(f"{'processus':>9} | {'requêtes/s':>10} | {'erreurs':>7}")
+
+    for n in args.workers:
+        env = dict(os.environ, WEBTRACKER_STATE_BACKEND=redis_url, PYTHONPATH=ROOT)
+        ports = [free_port() for _ in range(n)]
+        procs = [subprocess.Popen([sys.executable, '-c', WORKER_SCRIPT, str(port)], cwd=ROOT, env=env,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL) for port in ports]
+        try:
+            bases = [f"http://127.0.0.1:{port}" for port in ports]
+            for base in bases:
+                wait_for(f"{base}/api/state")
+            # Chaque table reçoit une vingtaine de participants (une seule fois : l'état est partagé).
+            for table in tables:
+                post(f"{bases[0]}/t/{table}/reset")
+                for i in range(20):
+                    post(f"{bases[0]}/t/{table}/add", {'name': f"Extra {i}", 'is_player': 'monster'})
+            requests_done, errors = run_load(bases, tables, args.clients, args.duration)
+            print(f"{n:>9} | {requests_done / args.duration:>10.1f} | {errors:>7}")
+        finally:
+            for p in procs:
+                p.terminate()
+            for p in procs:
+                p.wait()
+
+if __name__ == '__main__':
+    main()
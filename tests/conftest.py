@@ -0,0 +1,64 @@
+import os
+import sys
+import uuid
+import warnings
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+warnings.filterwarnings('ignore')
+# Pas de journal sur disque : les tables des tests ne survivent pas au processus.
+os.environ.setdefault('WEBTRACKER_JOURNAL_DIR', '')
+
+from app import app as flask_app, socketio
+from app.models import Participant, Tracker
+
+
+@pytest.fixture
+def app():
+    """L'application Flask, en mode test."""
+    flask_app.config['TESTING'] = True
+    return flask_app
+
+@pytest.fixture
+def table_id():
+    """Un identifiant de table neuf pour chaque test : les tables ne se partagent pas d'état."""
+    return f"test-{uuid.uuid4().hex[:12]}"
+
+@pytest.fixture
+def client(app):
+    """Client HTTP de l'application."""
+    return app.test_client()
+
+@pytest.fixture
+def socket_client(app, client, table_id):
+    """Client Socket.IO inscrit dans la salle de la table 'table_id'."""
+    sio = socketio.test_client(app, flask_test_client=client)
+    sio.emit('join_table', {'table': table_id, 'view': 'gm'})
+    sio.get_received()
+    yield sio
+    if sio.is_connected():
+        sio.disconnect()
+
+@pytest.fixture
+def make_participant():
+    """Fabrique de participants : 'make_participant(nom, initiative, p_type='Extra', is_player=False)'."""
+    def make(name, initiative, p_type='Extra', is_player=False):
+        return Participant(name, 'player' if is_player else 'monster', p_type, is_player, initiative_roll=initiative)
+    return make
+
+@pytest.fixture
+def tracker(app, make_participant):
+    """
+    Une table manipulée hors requête (chaque mutation est diffusée et enregistrée aussitôt) :
+    dix participants dont trois joueurs, le tour au premier, sans historique d'annulation.
+    """
+    with app.app_context():
+        table = Tracker(f"test-{uuid.uuid4().hex[:12]}")
+        participants = [make_participant(f"Combattant {i}", initiative, p_type='Joker' if i % 3 == 0 else 'Extra',
+                                         is_player=(i % 4 == 0))
+                        for i, initiative in enumerate((12, 7, 18, 7, 3, 15, 9, 20, 12, 1))]
+        table.set_participants(participants)
+        table.update_state(changed=participants)
+        table.undo_history.clear()
+        yield table
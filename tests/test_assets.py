@@ -0,0 +1,28 @@
+"""
+URL des portraits ('app.assets.portrait_url').
+"""
+import os
+from urllib.parse import quote
+
+import pytest
+
+from app.assets import PORTRAIT_DIR, portrait_url
+
+
+def test_portrait_url_has_digest():
+    portrait = next(os.path.relpath(os.path.join(root, name), PORTRAIT_DIR).replace(os.sep, '/')
+                    for root, _, names in os.walk(PORTRAIT_DIR) for name in names)
+    url = portrait_url(portrait, 'display')
+    assert url.startswith('/portraits/')
+    assert url.endswith('/display/' + quote(portrait))
+
+def test_missing_portrait_keeps_static_url():
+    assert portrait_url('absent.png', 'thumb') == '/static/portraits/absent.png'
+
+@pytest.mark.parametrize('portrait', ['../../__init__.py', '../portraits/../../models.py', '/etc/passwd'])
+def test_portrait_outside_directory(portrait):
+    assert portrait_url(portrait, 'display') is None
+
+def test_no_portrait():
+    assert portrait_url(None, 'display') is None
+    assert portrait_url('', 'thumb') is None
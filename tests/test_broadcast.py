@@ -0,0 +1,115 @@
+"""
+Diffusion des changements d'état : chaque route qui modifie une table émet exactement un
+delta ('state_delta') dans la salle de sa table, et chaque delta fait avancer la révision de un.
+"""
+import pytest
+
+from app import socketio
+
+
+def deltas(sio):
+    """Les deltas reçus par le client Socket.IO depuis le dernier appel."""
+    return [message['args'][0] for message in sio.get_received() if message['name'] == 'state_delta']
+
+def post(client, table_id, path, **kwargs):
+    response = client.post(f"/t/{table_id}{path}", **kwargs)
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+def one_delta(sio, rev):
+    """Vérifie qu'un seul delta a été reçu, appliqué sur 'rev' ; retourne ce delta."""
+    received = deltas(sio)
+    assert len(received) == 1, received
+    delta = received[0]
+    assert delta['base'] == rev
+    assert delta['rev'] == rev + 1
+    return delta
+
+@pytest.fixture
+def battle(client, table_id, socket_client):
+    """Une table avec un joueur et deux monstres ; retourne la révision et les identifiants de ses participants."""
+    rev = 0
+    for name, role in (('Alice', 'player'), ('Gobelin', 'monster'), ('Orque', 'monster')):
+        post(client, table_id, '/add', data={'name': name, 'is_player': role, 'type': 'Extra'})
+        rev = one_delta(socket_client, rev)['rev']
+    state = client.get(f"/t/{table_id}/api/state").get_json()
+    assert state['rev'] == rev
+    return rev, [p['id'] for p in state['snapshot']['participants']]
+
+
+def test_add(client, table_id, socket_client, battle):
+    rev, ids = battle
+    post(client, table_id, '/add', data={'name': 'Troll', 'is_player': 'monster', 'type': 'Joker'})
+    delta = one_delta(socket_client, rev)
+    assert [p['name'] for p in delta['upsert']] == ['Troll']
+    assert len(delta['order']) == len(ids) + 1
+
+def test_wound(client, table_id, socket_client, battle):
+    rev, ids = battle
+    post(client, table_id, f"/participants/{ids[1]}/add_wound")
+    delta = one_delta(socket_client, rev)
+    assert [p['id'] for p in delta['upsert']] == [ids[1]]
+
+def test_next(client, table_id, socket_client, battle):
+    rev, _ = battle
+    post(client, table_id, '/next')
+    one_delta(socket_client, rev)
+
+def test_new_round(client, table_id, socket_client, battle):
+    rev, ids = battle
+    post(client, table_id, '/new_round')
+    delta = one_delta(socket_client, rev)
+    assert sorted(p['id'] for p in delta['upsert']) == sorted(ids)
+
+def test_batch(client, table_id, socket_client, battle):
+    rev, ids = battle
+    operations = [{'op': 'wound', 'id': ids[0]}, {'op': 'add_status', 'id': ids[1], 'status': 'Secoué'},
+                  {'op': 'remove', 'id': ids[2]}]
+    post(client, table_id, '/api/batch', json={'operations': operations, 'rev': rev})
+    delta = one_delta(socket_client, rev)
+    assert delta['remove'] == [ids[2]]
+
+def test_spawn(client, table_id, socket_client, battle):
+    rev, ids = battle
+    spawned = post(client, table_id, '/spawn', data={'name': 'Rat', 'count': 50, 'is_player': 'monster'})['ids']
+    delta = one_delta(socket_client, rev)
+    assert sorted(p['id'] for p in delta['upsert']) == sorted(spawned)
+    assert len(delta['order']) == len(ids) + 50
+
+def test_undo(client, table_id, socket_client, battle):
+    rev, ids = battle
+    post(client, table_id, f"/participants/{ids[1]}/add_wound")
+    rev = one_delta(socket_client, rev)['rev']
+    post(client, table_id, '/undo')
+    one_delta(socket_client, rev)
+
+def test_other_tables_receive_nothing(app, client, table_id, socket_client, battle):
+    rev, ids = battle
+    other = socketio.test_client(app, flask_test_client=client)
+    other.emit('join_table', {'table': f"{table_id}-other"})
+    other.get_received()
+    post(client, table_id, f"/participants/{ids[0]}/add_wound")
+    one_delta(socket_client, rev)
+    assert deltas(other) == []
+    other.disconnect()
+
+def test_batch_without_change(client, table_id, socket_client, battle):
+    rev, _ = battle
+    participants = client.get(f"/t/{table_id}/api/state").get_json()['snapshot']['participants']
+    extra = next(p['id'] for p in participants if p['name'] == 'Gobelin')
+    post(client, table_id, '/api/batch', json={'operations': [{'op': 'wound', 'id': extra}]})
+    rev = one_delta(socket_client, rev)['rev']
+    # Un Extra déjà hors de combat ne peut pas être blessé de nouveau : rien n'est diffusé.
+    result = post(client, table_id, '/api/batch', json={'operations': [{'op': 'wound', 'id': extra}]})
+    assert result['rev'] == rev
+    assert result['results'] == [{'success': True, 'changed': False}]
+    assert deltas(socket_client) == []
+
+@pytest.mark.parametrize('duration', [True, False, 'deux', 1.5])
+def test_batch_invalid_duration(client, table_id, socket_client, battle, duration):
+    rev, ids = battle
+    operation = {'op': 'add_status', 'id': ids[0], 'status': 'Secoué', 'duration': duration}
+    response = client.post(f"/t/{table_id}/api/batch", json={'operations': [operation]})
+    assert response.status_code == 400
+    assert response.get_json()['results'][0]['message'] == 'Invalid duration'
+    assert deltas(socket_client) == []
@@ -0,0 +1,31 @@
+"""
+Pilotage du profilage par '/admin/profile'.
+"""
+import pytest
+
+from app import profiling
+
+
+@pytest.fixture
+def admin(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'PROFILE_ADMIN', True)
+    previous = dict(profiling.settings)
+    yield
+    profiling.configure(**previous)
+    profiling.reset()
+
+def test_read_only_by_default(app, client, monkeypatch):
+    monkeypatch.setitem(app.config, 'PROFILE_ADMIN', False)
+    assert client.get('/admin/profile').status_code == 200
+    response = client.post('/admin/profile', data={'rate': 0.5})
+    assert response.status_code == 403
+    assert response.get_json()['success'] is False
+    assert profiling.settings['rate'] == 0
+
+def test_post_when_allowed(client, admin):
+    response = client.post('/admin/profile', data={'rate': 0, 'interval': 0.01, 'reset': 1})
+    assert response.status_code == 200
+    assert response.get_json()['profile']['interval'] == 0.01
+
+def test_invalid_settings(client, admin):
+    assert client.post('/admin/profile', data={'rate': 2}).status_code == 400
@@ -0,0 +1,53 @@
+"""
+Verrou des tables avec un stockage d'état partagé ('app.state_store.RedisStateStore'), sur fakeredis.
+"""
+import logging
+
+import pytest
+
+from app import models
+from app.models import Tracker
+from app.state_store import RedisStateStore
+
+fakeredis = pytest.importorskip('fakeredis')
+
+
+@pytest.fixture
+def redis_store(monkeypatch):
+    """Un stockage Redis (fakeredis) à la place du stockage en mémoire, avec des verrous de courte durée."""
+    server = fakeredis.FakeServer()
+    store = RedisStateStore(fakeredis.FakeRedis(server=server), Tracker)
+    monkeypatch.setattr(RedisStateStore, 'LOCK_TIMEOUT', 0.2)
+    monkeypatch.setattr(models, 'state_store', store)
+    return store, fakeredis.FakeRedis(server=server)
+
+def state(client, table_id):
+    return client.get(f"/t/{table_id}/api/state").get_json()
+
+
+def test_busy_table_refuses_writes(client, table_id, redis_store):
+    store, other_client = redis_store
+    assert client.post(f"/t/{table_id}/add", data={'name': 'Gobelin', 'is_player': 'monster'}).status_code == 200
+    before = state(client, table_id)
+
+    # Un autre processus tient le verrou de la table plus longtemps que le délai d'attente.
+    other = other_client.lock(store._key(table_id, 'lock'), timeout=5)
+    assert other.acquire(blocking=False)
+    response = client.post(f"/t/{table_id}/add", data={'name': 'Orque', 'is_player': 'monster'})
+    assert response.status_code == 503
+    assert state(client, table_id) == before
+    assert other.owned()
+    other.release()
+
+    assert client.post(f"/t/{table_id}/add", data={'name': 'Orque', 'is_player': 'monster'}).status_code == 200
+    assert state(client, table_id)['rev'] == before['rev'] + 1
+
+def test_expired_lock_release_is_logged(table_id, redis_store, caplog):
+    store, other_client = redis_store
+    lock = store.lock(table_id)
+    assert lock.acquire()
+    # Le verrou expire pendant une mutation trop longue.
+    other_client.delete(store._key(table_id, 'lock'))
+    with caplog.at_level(logging.WARNING, logger='app.state_store'):
+        lock.release()
+    assert 'expiré' in caplog.text
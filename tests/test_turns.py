@@ -0,0 +1,161 @@
+"""
+Anneau des tours de 'Tracker' ('_next_actor', '_previous_actor') : après chaque mutation, il doit
+donner le même ordre qu'un parcours linéaire de 'initiative_data' qui saute les participants
+'Mort' ou en attente.
+"""
+import random
+
+import pytest
+
+
+def can_act(p):
+    return not p.on_hold and p.status['class'] != 'status-dead'
+
+def assert_ring(table):
+    """Compare l'anneau des tours et le prochain tour à un parcours linéaire de la liste d'initiative."""
+    data = table.initiative_data
+    keys = [(p.initiative_roll, p.name) for p in data]
+    assert keys == sorted(keys, reverse=True)
+    assert {p.id for p in data} == set(table.participants_by_id)
+    actors = [p for p in data if can_act(p)]
+    assert set(table._next_actor) == {p.id for p in actors}
+    assert set(table._previous_actor) == {p.id for p in actors}
+    for p, following in zip(actors, actors[1:] + actors[:1]):
+        assert table._next_actor[p.id] is following
+        assert table._previous_actor[following.id] is p
+    if table._resume is None and data:
+        count = len(data)
+        walk = [(table.current_turn_index + offset) % count for offset in range(1, count + 1)]
+        assert table.next_turn_index() == next((i for i in walk if can_act(data[i])), None)
+
+@pytest.fixture
+def table(tracker):
+    """La table commune des tests (voir 'conftest.py'), dont l'anneau initial est vérifié."""
+    assert_ring(tracker)
+    return tracker
+
+
+def test_add(table, make_participant):
+    for name, initiative in (('Renfort', 15), ('Tête', 25), ('Queue', 1), ('Combattant 1', 7)):
+        added = make_participant(name, initiative)
+        table.add_participants([added])
+        table.update_state(changed=[added])
+        assert_ring(table)
+    horde = [make_participant(f"Rat {i}", i % 20 + 1) for i in range(50)]
+    table.add_participants(horde)
+    table.update_state(changed=horde)
+    assert_ring(table)
+
+def test_remove(table):
+    table.next_turn()
+    for index in (0, len(table.initiative_data) - 1, table.current_turn_index, 2):
+        removed = table.get_participant_at(min(index, len(table.initiative_data) - 1))
+        table.remove_participant(removed)
+        table.update_state(removed=[removed])
+        assert_ring(table)
+
+def test_wound_to_dead(table):
+    for p in list(table.initiative_data):
+        for _ in range(5):
+            p.add_wound()
+            table.update_state(changed=[p])
+            assert_ring(table)
+    assert not table._next_actor
+    assert table.next_turn_index() is None
+    for p in table.initiative_data:
+        p.remove_wound()
+        table.update_state(changed=[p])
+        assert_ring(table)
+
+def test_reposition(table):
+    rng = random.Random(0)
+    for _ in range(20):
+        p = rng.choice(table.initiative_data)
+        p.initiative_roll = rng.randint(1, 25)
+        table.reposition_participants([p])
+        table.update_state(changed=[p])
+        assert_ring(table)
+
+def test_hold_and_act(table):
+    active = table.get_active_participant()
+    assert table.hold_turn(active)
+    assert_ring(table)
+    held = table.initiative_data[3]
+    assert table.hold_turn(held)
+    assert_ring(table)
+    assert table.act_now(held)
+    # Le participant interrompu reprend son tour avant le parcours normal.
+    assert table.next_turn()
+    assert_ring(table)
+    assert table.act_now(active)
+    table.next_turn()
+    assert_ring(table)
+
+def test_new_round(table):
+    table.hold_turn(table.initiative_data[2])
+    table.initiative_data[4].add_wound()
+    table.update_state(changed=[table.initiative_data[4]])
+    table.new_round()
+    assert_ring(table)
+    assert not any(p.on_hold for p in table.initiative_data)
+
+def test_undo(table, make_participant):
+    rng = random.Random(1)
+    for i in range(30):
+        p = rng.choice(table.initiative_data)
+        operation = i % 5
+        if operation == 0:
+            p.add_wound()
+            table.update_state(changed=[p])
+        elif operation == 1:
+            table.hold_turn(p)
+        elif operation == 2:
+            p.initiative_roll = rng.randint(1, 25)
+            table.reposition_participants([p])
+            table.update_state(changed=[p])
+        elif operation == 3:
+            table.remove_participant(p)
+            table.update_state(removed=[p])
+        else:
+            added = make_participant(f"Renfort {i}", rng.randint(1, 20))
+            table.add_participants([added])
+            table.update_state(changed=[added])
+    while table.undo():
+        assert_ring(table)
+    while table.redo():
+        assert_ring(table)
+
+@pytest.mark.parametrize('seed', range(5))
+def test_random_mutations(table, make_participant, seed):
+    rng = random.Random(seed)
+    for i in range(300):
+        operation = rng.random()
+        p = rng.choice(table.initiative_data) if table.initiative_data else None
+        if p is None or operation < 0.15:
+            added = make_participant(f"Renfort {i}", rng.randint(1, 20), p_type=rng.choice(('Extra', 'Joker')))
+            table.add_participants([added])
+            table.update_state(changed=[added])
+        elif operation < 0.3:
+            p.add_wound()
+            table.update_state(changed=[p])
+        elif operation < 0.4:
+            p.remove_wound()
+            table.update_state(changed=[p])
+        elif operation < 0.5:
+            table.remove_participant(p)
+            table.update_state(removed=[p])
+        elif operation < 0.6:
+            p.initiative_roll = rng.randint(1, 25)
+            table.reposition_participants([p])
+            table.update_state(changed=[p])
+        elif operation < 0.7:
+            table.hold_turn(p)
+        elif operation < 0.75:
+            table.act_now(p)
+        elif operation < 0.8:
+            table.new_round()
+        elif operation < 0.9:
+            table.undo()
+        else:
+            table.next_turn()
+        assert_ring(table)
@@ -0,0 +1,183 @@
+"""
+Annulation et rétablissement des mutations d'une table ('Tracker.undo()', 'Tracker.redo()').
+"""
+import gc
+import random
+import tracemalloc
+
+import pytest
+
+from app import models
+
+
+def snapshot(table):
+    """L'état comparable d'une table : les participants ('to_dict()') dans l'ordre d'initiative, et le participant actif."""
+    active = table.get_active_participant()
+    return [p.to_dict() for p in table.initiative_data], (active.id if active is not None else None)
+
+@pytest.fixture
+def table(tracker):
+    """La table commune des tests (voir 'conftest.py'), le tour au troisième participant."""
+    tracker.next_turn()
+    tracker.next_turn()
+    tracker.undo_history.clear()
+    return tracker
+
+def mutate(table, rng, i, make_participant=None):
+    """Une mutation au hasard, signalée comme le font les routes. Sans 'make_participant', la liste ne grandit pas."""
+    operation = rng.random()
+    p = rng.choice(table.initiative_data)
+    if operation < 0.3:
+        p.add_wound()
+        table.update_state(changed=[p])
+    elif operation < 0.5:
+        p.remove_wound()
+        table.update_state(changed=[p])
+    elif operation < 0.6 and make_participant is not None and len(table.initiative_data) > 5:
+        table.remove_participant(p)
+        table.update_state(removed=[p])
+    elif operation < 0.7 and make_participant is not None:
+        added = make_participant(f"Renfort {i}", rng.randint(1, 20))
+        table.add_participants([added])
+        table.update_state(changed=[added])
+    elif operation < 0.8:
+        if not p.add_status('Secoué', 2):
+            p.remove_statuses('Secoué')
+        table.update_state(changed=[p])
+    else:
+        table.next_turn()
+
+def assert_undo_redo(table, mutation):
+    """Applique 'mutation', puis vérifie que l'annulation et le rétablissement restaurent exactement chaque état."""
+    before = snapshot(table)
+    mutation()
+    after = snapshot(table)
+    assert after != before
+    assert table.undo()
+    assert snapshot(table) == before
+    assert table.redo()
+    assert snapshot(table) == after
+    assert not table.redo()
+
+
+def test_history_is_bounded(table, make_participant):
+    rng = random.Random(0)
+    for i in range(3000):
+        mutate(table, rng, i, make_participant)
+        assert len(table.undo_history) <= models.UNDO_HISTORY_SIZE
+    assert len(table.undo_history) == models.UNDO_HISTORY_SIZE
+    undone = 0
+    while table.undo():
+        undone += 1
+    assert undone == models.UNDO_HISTORY_SIZE
+    assert not table.undo_history
+
+def test_history_memory_stops_growing(table):
+    rng = random.Random(2)
+    tracemalloc.start()
+    try:
+        # Remplit l'historique (et l'historique des deltas), puis mesure la mémoire sur 3000 mutations de plus.
+        for i in range(models.UNDO_HISTORY_SIZE * 3):
+            mutate(table, rng, i)
+        gc.collect()
+        start = tracemalloc.get_traced_memory()[0]
+        for i in range(3000):
+            mutate(table, rng, i)
+        gc.collect()
+        growth = tracemalloc.get_traced_memory()[0] - start
+    finally:
+        tracemalloc.stop()
+    # Chaque nouvelle étape remplace la plus ancienne : la mémoire ne croît plus (une étape occupe environ 1 ko).
+    assert growth < 64 * 1024, growth
+
+def test_wound(table):
+    p = table.initiative_data[4]
+    assert_undo_redo(table, lambda: (p.add_wound(), table.update_state(changed=[p])))
+
+def test_remove(table):
+    def remove():
+        p = table.get_active_participant()
+        table.remove_participant(p)
+        table.update_state(removed=[p])
+    assert_undo_redo(table, remove)
+
+def test_remove_before_active(table):
+    def remove():
+        p = table.initiative_data[0]
+        table.remove_participant(p)
+        table.update_state(removed=[p])
+    assert_undo_redo(table, remove)
+
+def test_spawn(table, make_participant):
+    def spawn():
+        spawned = [make_participant(f"Rat {i}", i % 20 + 1) for i in range(models.REPOSITION_LIMIT * 2)]
+        table.add_participants(spawned)
+        table.update_state(changed=spawned)
+    assert_undo_redo(table, spawn)
+
+def test_new_round(table):
+    table.initiative_data[1].add_status('Secoué', 1)
+    table.initiative_data[6].add_status('Étourdi', 3)
+    table.update_state(changed=[table.initiative_data[1], table.initiative_data[6]])
+    random.seed(3)
+    assert_undo_redo(table, table.new_round)
+
+@pytest.fixture
+def twins(table, make_participant):
+    """Cinq participants de même nom et de même initiative, ajoutés un à un."""
+    added = [make_participant('Gobelin', 12) for _ in range(5)]
+    for p in added:
+        table.add_participants([p])
+        table.update_state(changed=[p])
+    table.undo_history.clear()
+    return added
+
+def test_equal_keys_remove(table, twins):
+    for p in twins:
+        def remove():
+            table.remove_participant(p)
+            table.update_state(removed=[p])
+        assert_undo_redo(table, remove)
+
+def test_equal_keys_reposition(table, twins):
+    for p in twins:
+        def reposition():
+            p.initiative_roll = 3
+            table.reposition_participants([p])
+            table.update_state(changed=[p])
+        assert_undo_redo(table, reposition)
+        p.initiative_roll = 3
+        table.reposition_participants([p])
+        table.update_state(changed=[p])
+    for _ in twins:
+        before = snapshot(table)
+        table.undo()
+        table.redo()
+        assert snapshot(table) == before
+
+def test_equal_keys_new_round(table, twins):
+    random.seed(5)
+    assert_undo_redo(table, table.new_round)
+
+def test_sequence(table, make_participant):
+    rng = random.Random(1)
+    states = [snapshot(table)]
+    for i in range(50):
+        mutate(table, rng, i, make_participant)
+        if snapshot(table) != states[-1]:
+            states.append(snapshot(table))
+    for expected in reversed(states[:-1]):
+        assert table.undo()
+        assert snapshot(table) == expected
+    assert not table.undo()
+    for expected in states[1:]:
+        assert table.redo()
+        assert snapshot(table) == expected
+
+def test_new_mutation_clears_redo(table):
+    p = table.initiative_data[0]
+    p.add_wound()
+    table.update_state(changed=[p])
+    table.undo()
+    table.next_turn()
+    assert not table.redo()